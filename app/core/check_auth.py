@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from http import HTTPStatus
 from typing import Union
 
@@ -5,6 +6,7 @@ from fastapi import Header, HTTPException
 from starlette.responses import JSONResponse
 
 from app.core.jwt_handler import decode_access_token
+from app.db.async_db import get_user_id
 
 
 def check_auth(authorization: str = Header(...)) -> Union[JSONResponse, dict]:
@@ -19,4 +21,46 @@ def check_auth(authorization: str = Header(...)) -> Union[JSONResponse, dict]:
             content={"error": data}
         )
 
-    return data
\ No newline at end of file
+    return data
+
+
+class AuthError(Exception):
+    # Ответ с ошибкой авторизации; возвращается клиенту обработчиком, зарегистрированным в app.main
+    def __init__(self, response: JSONResponse):
+        super().__init__(response.body.decode())
+        self.response = response
+
+
+@dataclass(frozen=True)
+class Principal:
+    user_id: int
+    username: str
+    role: str
+    group: str | None
+
+
+async def get_principal(authorization: str = Header(...)) -> Principal:
+    """
+    Зависимость FastAPI: пользователь запроса по данным JWT-токена, без обращения к таблице User.
+    Токены, выданные /register до добавления в них user_id, дополняются одним запросом по username.
+
+    :param authorization: Заголовок Authorization
+    :return: Пользователь запроса
+    :raises AuthError: Если токен отсутствует, недействителен или истёк
+    """
+    check_data = check_auth(authorization)
+    if isinstance(check_data, JSONResponse):
+        raise AuthError(check_data)
+
+    user_id = check_data.get('user_id')
+    if user_id is None:
+        user_id = await get_user_id(check_data['username'])
+        if user_id is None:
+            raise AuthError(JSONResponse(status_code=HTTPStatus.BAD_REQUEST, content={"error": "Invalid token."}))
+
+    return Principal(
+        user_id=user_id,
+        username=check_data['username'],
+        role=check_data['roletype'],
+        group=check_data.get('studygroup'),
+    )
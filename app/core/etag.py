@@ -0,0 +1,42 @@
+import hashlib
+
+from fastapi import Response
+from http import HTTPStatus
+
+# Ответы зависят от пользователя: браузер может хранить их только у себя и должен проверять актуальность
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*stamps) -> str:
+    """
+    Слабый ETag по версионным отметкам ответа (данные, от которых зависит тело ответа, но не само тело).
+
+    :param stamps: Значения с детерминированным repr (числа, строки, кортежи, словари)
+    :return: Значение заголовка ETag
+    """
+    digest = hashlib.sha256(repr(stamps).encode('utf-8')).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Проверяет заголовок If-None-Match (слабое сравнение, RFC 9110).
+
+    :param if_none_match: Значение заголовка If-None-Match или None
+    :param etag: Текущий ETag ответа
+    :return: True, если клиенту можно ответить 304 Not Modified
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == opaque for tag in if_none_match.split(','))
+
+
+def etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=etag_headers(etag))
@@ -0,0 +1,73 @@
+import csv
+from typing import TextIO
+
+from app.core.files.test_cases import MAX_REPORTED_ERRORS
+
+# Обязательные и необязательные столбцы файла списка группы (CSV с заголовком)
+ROSTER_REQUIRED_COLUMNS = ('username', 'password')
+ROSTER_PROFILE_COLUMNS = ('first_name', 'last_name', 'middle_name', 'form_education', 'faculty')
+
+# Максимальная длина значений (совпадает с длиной столбцов таблицы User)
+ROSTER_COLUMN_LIMITS = {
+    'username': 64,
+    'password': 255,
+    'first_name': 64,
+    'last_name': 64,
+    'middle_name': 64,
+    'form_education': 255,
+    'faculty': 255,
+}
+
+
+class RosterFileError(ValueError):
+    def __init__(self, errors: list[str]):
+        super().__init__("Invalid roster file: " + "; ".join(errors))
+        self.errors = errors
+
+
+def parse_roster(stream: TextIO) -> tuple[list[str], list[dict]]:
+    """
+    Читает и проверяет CSV-файл списка группы за один проход по строкам.
+    Обязательные столбцы - username и password; столбцы профиля (first_name, last_name, middle_name,
+    form_education, faculty) необязательны и обновляются у существующих пользователей, только если есть в файле.
+
+    :param stream: Текстовый поток файла
+    :return: Пара (столбцы профиля, присутствующие в файле; список словарей пользователей в порядке файла)
+    :raises RosterFileError: Если файл пуст или содержит некорректные строки
+    """
+    reader = csv.DictReader(stream)
+    if reader.fieldnames is None or not set(ROSTER_REQUIRED_COLUMNS) <= set(reader.fieldnames):
+        raise RosterFileError(["line 1: CSV header must contain 'username' and 'password' columns"])
+    columns = [column for column in ROSTER_PROFILE_COLUMNS if column in reader.fieldnames]
+
+    users = []
+    errors = []
+    usernames = set()
+    for row in reader:
+        user = {column: (row.get(column) or '').strip() for column in ROSTER_REQUIRED_COLUMNS + tuple(columns)}
+
+        error = None
+        if not user['username'] or not user['password']:
+            error = "both 'username' and 'password' are required"
+        elif user['username'] in usernames:
+            error = f"duplicate username '{user['username']}'"
+        else:
+            too_long = [column for column, value in user.items() if len(value) > ROSTER_COLUMN_LIMITS[column]]
+            if too_long:
+                error = f"'{too_long[0]}' must be at most {ROSTER_COLUMN_LIMITS[too_long[0]]} characters"
+
+        if error is None:
+            usernames.add(user['username'])
+            users.append(user)
+            continue
+
+        errors.append(f"line {reader.line_num}: {error}")
+        if len(errors) >= MAX_REPORTED_ERRORS:
+            errors.append("too many errors")
+            break
+
+    if errors:
+        raise RosterFileError(errors)
+    if not users:
+        raise RosterFileError(["file contains no users"])
+    return columns, users
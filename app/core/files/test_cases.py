@@ -0,0 +1,85 @@
+import csv
+import json
+from typing import Iterable, TextIO
+
+# Поддерживаемые форматы файлов тестовых случаев (по расширению файла)
+TEST_CASE_FORMATS = ('.csv', '.jsonl')
+
+MAX_REPORTED_ERRORS = 20  # Сколько ошибок перечислять в ответе
+
+
+class TestCaseFileError(ValueError):
+    def __init__(self, errors: list[str]):
+        super().__init__("Invalid test case file: " + "; ".join(errors))
+        self.errors = errors
+
+
+def test_case_format(file_name: str) -> str | None:
+    for extension in TEST_CASE_FORMATS:
+        if file_name.endswith(extension):
+            return extension
+    return None
+
+
+def _csv_rows(stream: TextIO) -> Iterable[tuple[int, object, object, str | None]]:
+    # CSV с заголовком input,output; поля с переводами строк берутся в кавычки
+    reader = csv.DictReader(stream)
+    if reader.fieldnames is None or not {'input', 'output'} <= set(reader.fieldnames):
+        raise TestCaseFileError(["line 1: CSV header must contain 'input' and 'output' columns"])
+    for row in reader:
+        yield reader.line_num, row.get('input'), row.get('output'), None
+
+
+def _jsonl_rows(stream: TextIO) -> Iterable[tuple[int, object, object, str | None]]:
+    # Одна строка - один объект {"input": ..., "output": ...}
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, None, None, f"invalid JSON ({e.msg})"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, None, "expected a JSON object"
+            continue
+        yield line_number, row.get('input'), row.get('output'), None
+
+
+def parse_test_cases(stream: TextIO, file_format: str, max_length: int) -> list[tuple[str, str]]:
+    """
+    Читает и проверяет файл тестовых случаев за один проход по строкам.
+
+    :param stream: Текстовый поток файла
+    :param file_format: Формат файла ('.csv' или '.jsonl')
+    :param max_length: Максимальная длина входных и выходных данных
+    :return: Список пар (входные данные, ожидаемый вывод) в порядке следования в файле
+    :raises TestCaseFileError: Если файл пуст или содержит некорректные строки
+    """
+    rows = _csv_rows(stream) if file_format == '.csv' else _jsonl_rows(stream)
+
+    cases = []
+    errors = []
+    for line_number, input_data, output_data, error in rows:
+        if error is not None:
+            pass  # строку не удалось разобрать
+        elif not isinstance(input_data, str) or not isinstance(output_data, str):
+            error = "'input' and 'output' must be strings"
+        elif not input_data or not output_data:
+            error = "both 'input' and 'output' are required"
+        elif len(input_data) > max_length or len(output_data) > max_length:
+            error = f"'input' and 'output' must be at most {max_length} characters"
+        else:
+            cases.append((input_data, output_data))
+            continue
+
+        errors.append(f"line {line_number}: {error}")
+        if len(errors) >= MAX_REPORTED_ERRORS:
+            errors.append("too many errors")
+            break
+
+    if errors:
+        raise TestCaseFileError(errors)
+    if not cases:
+        raise TestCaseFileError(["file contains no test cases"])
+    return cases
@@ -1,7 +1,10 @@
+import threading
+
 import jwt
 from datetime import datetime, timedelta
 from typing import Optional, Union
 from app.config.config import init_config
+from app.core.cache import LRUCache
 
 
 config = init_config()['jwt']
@@ -10,6 +13,12 @@ SECRET_KEY = config["secret_key"]
 ALGORITHM = config["algorithm"]
 EXPIRES_IN = config["expires_in"]  # Время жизни токена в секундах
 
+# Кэш проверенных токенов: токен -> декодированные данные. Запись истекает вместе с токеном (exp),
+# при переполнении вытесняется по LRU. Недействительные токены не кэшируются.
+# check_auth вызывается и из потоков (синхронные зависимости FastAPI), поэтому доступ под блокировкой.
+tokens = LRUCache(maxsize=config["token_cache_size"])
+_tokens_lock = threading.Lock()
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
@@ -31,10 +40,19 @@ def decode_access_token(token: str) -> Union[dict, str]:
     :param token: Токен для декодирования.
     :return: Декодированные данные токена или str, если токен недействителен.
     """
+    with _tokens_lock:
+        payload = tokens.get(token)
+    if payload is not None:
+        return dict(payload)  # копия, чтобы вызывающий код не изменил закэшированные данные
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except jwt.ExpiredSignatureError:
         return "Token has expired."
     except jwt.InvalidTokenError:
         return "Invalid token."
+
+    # После exp запись удаляется из кэша, и повторная проверка вернёт "Token has expired."
+    with _tokens_lock:
+        tokens.set(token, payload, expires_at=payload.get("exp"))
+    return dict(payload)
@@ -0,0 +1,132 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config.config import init_config
+
+cfg = init_config()['auth']
+
+# Формат хэша: pbkdf2_sha256$<итерации>$<соль>$<хэш в base64>. Строки без этого префикса -
+# пароли, сохранённые до введения хэширования; они заменяются хэшем при следующем входе.
+ALGORITHM = 'pbkdf2_sha256'
+SALT_BYTES = 16
+
+# Хэширование занимает сотни миллисекунд процессорного времени, поэтому выполняется в отдельном
+# ограниченном пуле потоков (hashlib освобождает GIL), а не в event loop.
+executor = ThreadPoolExecutor(max_workers=cfg['hash_workers'], thread_name_prefix='password-hash')
+
+# Ограничение числа проверок, ожидающих пул или выполняющихся в нём
+_pending = 0
+
+
+class TooManyPasswordChecks(Exception):
+    pass
+
+
+def hash_password(password: str, iterations: int | None = None) -> str:
+    """
+    Вычисляет хэш пароля со случайной солью.
+
+    :param password: Пароль
+    :param iterations: Число итераций PBKDF2 (по умолчанию - hash_iterations из конфигурации)
+    :return: Строка хэша для столбца User.password
+    """
+    iterations = iterations or cfg['hash_iterations']
+    salt = secrets.token_hex(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('ascii'), iterations)
+    return f"{ALGORITHM}${iterations}${salt}${base64.b64encode(digest).decode('ascii')}"
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """
+    Проверяет пароль по сохранённому хэшу (или по паролю в открытом виде для старых записей).
+
+    :param password: Введённый пароль
+    :param stored: Значение столбца User.password
+    :return: True, если пароль верный
+    """
+    if not stored.startswith(ALGORITHM + '$'):
+        return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+
+    try:
+        _, iterations, salt, digest = stored.split('$')
+        expected = base64.b64decode(digest)
+        actual = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('ascii'), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def needs_rehash(stored: str) -> bool:
+    # Пароль в открытом виде или хэш с числом итераций, отличным от текущей настройки
+    return not stored.startswith(f"{ALGORITHM}${cfg['hash_iterations']}$")
+
+
+# Хэш для проверки входа несуществующего пользователя: проверка по нему занимает столько же времени,
+# поэтому время ответа не выдаёт, есть ли такой username. Ни один пароль ему не соответствует.
+_DUMMY_HASH = f"{ALGORITHM}${cfg['hash_iterations']}${'0' * SALT_BYTES * 2}${base64.b64encode(bytes(32)).decode('ascii')}"
+
+# Значение User.password, с которым вход невозможен (пароль неизвестен и будет задан позже)
+UNUSABLE_PASSWORD = _DUMMY_HASH
+
+
+async def _run(func, *args):
+    global _pending
+    if _pending >= cfg['max_pending']:
+        raise TooManyPasswordChecks()
+
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    hash_password в пуле хэширования.
+
+    :raises TooManyPasswordChecks: Если в очереди пула уже max_pending задач
+    """
+    return await _run(hash_password, password)
+
+
+async def hash_passwords_async(passwords: list[str]) -> list[str]:
+    """
+    Хэширует список паролей (импорт списка группы) в пуле хэширования порциями по hash_workers паролей.
+    Используется облегчённый хэш (import_hash_iterations итераций), чтобы импорт тысяч пользователей
+    занимал секунды; при первом входе needs_rehash заменяет его хэшем с hash_iterations итераций.
+    В очереди пула перед проверкой пароля при входе оказывается не больше одной порции импорта,
+    поэтому импорт не останавливает вход остальных пользователей; ограничение max_pending к импорту не применяется.
+
+    :param passwords: Пароли
+    :return: Хэши в том же порядке
+    """
+    loop = asyncio.get_running_loop()
+    iterations = cfg['import_hash_iterations']
+    hashes = []
+    for start in range(0, len(passwords), cfg['hash_workers']):
+        batch = passwords[start:start + cfg['hash_workers']]
+        hashes += await asyncio.gather(*(loop.run_in_executor(executor, hash_password, password, iterations)
+                                        for password in batch))
+    return hashes
+
+
+async def verify_password_async(password: str, stored: str | None) -> bool:
+    """
+    verify_password в пуле хэширования. Для stored=None (пользователь не найден) проверяется
+    фиктивный хэш, чтобы время ответа не зависело от существования пользователя.
+
+    :raises TooManyPasswordChecks: Если в очереди пула уже max_pending задач
+    """
+    if stored is None:
+        await _run(verify_password, password, _DUMMY_HASH)
+        return False
+    return await _run(verify_password, password, stored)
+
+
+def shutdown():
+    executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,653 @@
+from typing import Union
+
+from sqlalchemy import select, insert, update, delete, func, true
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.core.passwords import verify_password_async, hash_password_async, hash_passwords_async, needs_rehash, \
+    UNUSABLE_PASSWORD
+from app.db import catalogue, enrollments
+from app.db.pool import MeteredAsyncQueuePool, pool_options
+from app.db.db import cfg, association_table, User, Solution, Task, TestCase, TestResult, \
+    TEST_OUTPUT_LIMIT, ROSTER_DEFAULTS, user_subjects_query, source_hash, \
+    save_source_query, subjects_by_identifiers_query, upsert_users_query, enroll_users_query
+from app.schemas.auth import RegisterRequest
+from app.schemas.subject import SubjectInfo
+from app.schemas.users import User as UserSchema
+from app.schemas.task import Task as TaskSchema
+from app.testing_pyfiles.result_cache import invalidate_task as invalidate_task_results
+
+# Асинхронный доступ к БД для обработчиков запросов и тестирования решений.
+# Модели общие с app.db.db; синхронный модуль остаётся для скриптов наполнения и администрирования.
+DATABASE_URL = f"postgresql+asyncpg://{cfg['user']}:{cfg['password']}@{cfg['host']}:{cfg['port']}/{cfg['name']}"
+engine = create_async_engine(DATABASE_URL, echo=False, poolclass=MeteredAsyncQueuePool, **pool_options(cfg))
+Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+
+async def validate_user(username: str, password: str) -> Union[dict, bool]:
+    """
+    Validates the username and password of a user.
+    The password is checked in the password hashing pool; a plaintext or outdated hash is replaced
+    with a hash using the current settings.
+
+    :param username: The username of the user.
+    :param password: The password of the user.
+    :return: User information if the username and password match, False otherwise.
+    :raises TooManyPasswordChecks: If the password hashing pool is overloaded.
+    """
+    async with Session() as session:
+        user = (await session.execute(
+            select(User.id, User.username, User.password, User.roleType, User.studyGroup)
+            .filter_by(username=username).limit(1)
+        )).first()
+
+    # Соединение с БД не удерживается на время проверки пароля
+    if not await verify_password_async(password, user.password if user else None):
+        return False
+
+    if needs_rehash(user.password):
+        new_password = await hash_password_async(password)
+        async with Session() as session:
+            # Условие по старому значению: пароль, изменённый за время хэширования, не перезаписывается
+            await session.execute(
+                update(User).where(User.id == user.id, User.password == user.password).values(password=new_password)
+            )
+            await session.commit()
+
+    return {
+        "user_id": user.id,
+        "username": user.username,
+        "roletype": user.roleType,
+        "studygroup": user.studyGroup
+    }
+
+
+async def get_user_id(username: str) -> int | None:
+    """
+    Получает ID пользователя по имени.
+
+    :param username: Имя пользователя
+    :return: ID пользователя, если найден, иначе None
+    """
+    async with Session() as session:
+        return await session.scalar(select(User.id).filter_by(username=username))
+
+
+async def get_user_data(user_id: int) -> UserSchema:
+    """
+    Retrieves all information of a user by ID.
+
+    :param user_id: The ID of the user.
+    :return: User information if the user exists.
+    """
+    async with Session() as session:
+        user = await session.get(User, user_id)
+
+        if user:
+            return UserSchema(
+                username=user.username,
+                first_name=user.first_name,
+                last_name=user.last_name,
+                middle_name=user.middle_name,
+                password=user.password,
+                roleType=user.roleType,
+                studyGroup=user.studyGroup,
+                form_education=user.form_education,
+                faculty=user.faculty
+            )
+
+        return UserSchema()
+
+
+async def add_user(register_data: RegisterRequest) -> Union[dict, str]:
+    """
+    Adds a new user to the database.
+
+    :param register_data: The data of the user to be added.
+    :return: A dictionary with user information if the user is added successfully, or an error message.
+    :raises TooManyPasswordChecks: If the password hashing pool is overloaded.
+    """
+    new_user = User(
+        first_name="Иван",
+        last_name="Иванов",
+        middle_name="Иванович",
+        username=register_data.username,
+        password=await hash_password_async(register_data.password),
+        roleType='student',  # Default role type
+        studyGroup=register_data.group_name,
+        form_education='Бюджет',
+        faculty='Информационные системы и технологии'  # Default faculty
+    )
+    async with Session() as session:
+        try:
+            session.add(new_user)
+            await session.commit()
+            return {
+                "user_id": new_user.id,
+                "username": new_user.username,
+                "roletype": new_user.roleType,
+                "studygroup": new_user.studyGroup,
+                "form_education": new_user.form_education,
+                "faculty": new_user.faculty
+            }
+        except IntegrityError:
+            await session.rollback()
+            return "User not added"
+
+
+async def import_roster(study_group: str, columns: list[str], users: list[dict],
+                        subject_identifiers: list[str]) -> dict:
+    """
+    Регистрирует список пользователей учебной группы и зачисляет их на дисциплины одной транзакцией:
+    пакетный upsert пользователей по username и зачисление одним INSERT ... SELECT.
+    До транзакции одной сессией проверяются дисциплины и находятся уже существующие пользователи, затем
+    в пуле хэширования хэшируются пароли новых пользователей облегчённым хэшем (около 0.6 мс на пароль
+    при настройках по умолчанию, см. hash_passwords_async).
+
+    :param study_group: Учебная группа
+    :param columns: Столбцы профиля, присутствующие в списке (см. app.core.files.roster.parse_roster)
+    :param users: Список словарей пользователей с ключами username, password и столбцами из columns
+    :param subject_identifiers: ID или имена дисциплин для зачисления
+    :return: Словарь с ключами created, updated (число пользователей) и enrolled (число новых зачислений)
+    :raises ValueError: Если какая-либо дисциплина не найдена
+    """
+    async with Session() as session:
+        subjects = (await session.execute(subjects_by_identifiers_query(subject_identifiers))).all()
+        found = {str(subject_id) for subject_id, _ in subjects} | {name for _, name in subjects}
+        for subject_identifier in subject_identifiers:
+            if subject_identifier not in found:
+                raise ValueError(f"Subject with identifier '{subject_identifier}' not found.")
+
+        existing = set(await session.scalars(
+            select(User.username).where(User.username.in_([user['username'] for user in users]))
+        ))
+
+    # Хэшируются только пароли новых пользователей: у существующих пароль не меняется (upsert_users_query).
+    # Их строкам передаётся непригодный хэш, поэтому пользователь, удалённый за время хэширования,
+    # будет создан без возможности входа, а не с паролем в открытом виде
+    new_users = [user for user in users if user['username'] not in existing]
+    hashes = dict(zip(
+        (user['username'] for user in new_users),
+        await hash_passwords_async([user['password'] for user in new_users])
+    ))
+
+    # Для новых пользователей недостающие столбцы профиля заполняются значениями по умолчанию
+    rows = [
+        {**ROSTER_DEFAULTS, **user, "password": hashes.get(user['username'], UNUSABLE_PASSWORD),
+         "roleType": 'student', "studyGroup": study_group}
+        for user in users
+    ]
+
+    async with Session() as session:
+        try:
+            upserted = (await session.execute(upsert_users_query(columns), rows)).all()
+            created = sum(1 for _, inserted in upserted if inserted)
+
+            # Дисциплина, удалённая за время хэширования, просто не попадает в зачисление (INSERT ... SELECT)
+            enrolled = 0
+            if subjects:
+                result = await session.execute(enroll_users_query(
+                    [user_id for user_id, _ in upserted], [subject_id for subject_id, _ in subjects]
+                ))
+                enrolled = result.rowcount
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            print(f"Error importing roster of group {study_group}: {e}")
+            raise
+
+    if enrolled:
+        enrollments.invalidate_users(user_id for user_id, _ in upserted)
+
+    return {"created": created, "updated": len(upserted) - created, "enrolled": enrolled}
+
+
+async def get_user_subjects(user_id: int) -> list[SubjectInfo]:
+    """
+    Получает все дисциплины, на которые зачислен пользователь, вместе с его оценками
+    одним запросом.
+
+    :param user_id: ID пользователя
+    :return: Список дисциплин, на которые зачислен пользователь
+    """
+    async with Session() as session:
+        try:
+            rows = (await session.execute(user_subjects_query(user_id))).all()
+            return [SubjectInfo(id=subject_id, name=name, grade=grade) for subject_id, name, grade in rows]
+
+        except Exception as e:
+            return list[SubjectInfo]()
+
+
+@catalogue.cached('subject_id_by_task')
+async def get_subject_id_by_task(task_id: int) -> int | None:
+    """
+    Получает subject_id по task_id (через кэш каталога).
+
+    :param task_id: ID задачи
+    :return: ID предмета, если найден, иначе None
+    """
+    async with Session() as session:
+        return await session.scalar(select(Task.Subject_id).filter_by(id=task_id))
+
+
+async def add_solution(code, user_id, task_id, mark=None, length_test_result=None, formula_test_result=None,
+                       auto_test_result=None) -> str | bool:
+    """
+    Добавляет решение в базу данных.
+
+    :param code: Код решения (обязательное поле)
+    :param user_id: ID пользователя (обязательное поле)
+    :param task_id: ID задачи (обязательное поле)
+    :param mark: Оценка (опционально)
+    :param length_test_result: Результат теста по длине (опционально)
+    :param formula_test_result: Результат теста по формуле (опционально)
+    :param auto_test_result: Результат автотеста (опционально)
+    :return: True или текст ошибки
+    """
+    if not code:
+        return "Code is a required field."
+
+    # Зачисление на предмет задачи проверяется по индексу зачислений, без запроса к БД при попадании
+    subject_id = await get_subject_id_by_task(task_id)
+    if not subject_id:
+        return "Task not found."
+
+    if subject_id not in await get_user_subject_ids(user_id):
+        return "User is not enrolled in the subject."
+
+    async with Session() as session:
+        try:
+            # Код сохраняется один раз на содержимое, решение ссылается на него по хэшу
+            code_hash = source_hash(code)
+            await session.execute(save_source_query(code_hash, code))
+
+            solution = Solution(
+                code_hash=code_hash,
+                mark=mark,
+                lengthTestResult=length_test_result,
+                formulaTestResult=formula_test_result,
+                autoTestResult=auto_test_result,
+                User_id=user_id,  # Привязка к пользователю
+                Task_id=task_id  # Привязка к задаче
+            )
+            session.add(solution)
+            await session.commit()
+            return True
+        except Exception as e:
+            await session.rollback()
+            return "Error adding solution"
+
+
+@catalogue.cached('task_data')
+async def get_task_data(task_id: int) -> dict | None:
+    """
+    Получает данные задачи по её ID (через кэш каталога).
+
+    :param task_id: ID задачи
+    :return: Словарь с данными задачи, если найдена, иначе None
+    """
+    async with Session() as session:
+        task = await session.get(Task, task_id)
+        if task:
+            return {
+                "id": task.id,
+                "name": task.name,
+                "description": task.description,
+                "teacher_formula": task.teacher_formula,
+                "input_variables": task.input_variables
+            }
+        return None
+
+
+async def get_tasks_by_subject(subject_identifier: str) -> list[TaskSchema]:
+    """
+    Получает все задачи, связанные с предметом по его ID (через кэш каталога).
+
+    :param subject_identifier: ID предмета
+    :return: Список задач, связанных с предметом, по возрастанию ID
+    """
+    try:
+        return await _get_subject_tasks(int(subject_identifier))
+    except Exception as e:
+        return list[TaskSchema]()
+
+
+@catalogue.cached('subject_tasks')
+async def _get_subject_tasks(subject_id: int) -> list[TaskSchema]:
+    # Для несуществующего предмета результат пустой, отдельная проверка предмета не нужна
+    async with Session() as session:
+        tasks = (await session.scalars(select(Task).filter_by(Subject_id=subject_id).order_by(Task.id))).all()
+        return [TaskSchema(id=task.id, name=task.name, description=task.description) for task in tasks]
+
+
+async def get_user_subject_ids(user_id: int) -> frozenset[int]:
+    """
+    Получает ID дисциплин, на которые зачислен пользователь. Результат берётся из индекса зачислений
+    (app.db.enrollments), к БД запрос выполняется только при его отсутствии или истечении.
+
+    :param user_id: ID пользователя
+    :return: Множество ID дисциплин
+    """
+    subject_ids = enrollments.get_subject_ids(user_id)
+    if subject_ids is not None:
+        return subject_ids
+
+    read_version = enrollments.version()
+    async with Session() as session:
+        subject_ids = frozenset(await session.scalars(
+            select(association_table.c.subject_id).where(association_table.c.user_id == user_id)
+        ))
+    enrollments.store_subject_ids(user_id, subject_ids, read_version)
+    return subject_ids
+
+
+async def is_user_enrolled_in_subject(user_id: int, subject_identifier: str) -> bool | str:
+    """
+    Проверяет, зачислен ли пользователь на предмет по его ID.
+
+    :param user_id: ID пользователя
+    :param subject_identifier: ID предмета
+    :return: True, если пользователь зачислен на предмет, иначе False (или текст ошибки)
+    """
+    try:
+        subject_ids = await get_user_subject_ids(user_id)
+    except Exception as e:
+        print(f"Error checking enrollment for user {user_id} in subject {subject_identifier}: {e}")
+        return "Error"
+
+    if not subject_ids:
+        return "No subjects found"
+
+    # ID сравнивается в каноническом виде, как cast(subject_id, String) в enrollment_query
+    return subject_identifier.isdecimal() and str(int(subject_identifier)) == subject_identifier \
+        and int(subject_identifier) in subject_ids
+
+
+async def get_test_cases_by_task(task_id) -> list[TestCase]:
+    """
+    Получает все тестовые случаи, связанные с задачей по её ID.
+
+    :param task_id: ID задачи
+    :return: Список тестовых случаев для указанной задачи
+    :raises ValueError: Если задача с таким ID не найдена
+    """
+    async with Session() as session:
+        task = await session.get(Task, task_id)
+        if not task:
+            raise ValueError(f"Task with ID {task_id} not found.")
+
+        return list((await session.scalars(select(TestCase).filter_by(Task_id=task_id).order_by(TestCase.id))).all())
+
+
+async def get_task_grading_data(task_id: int) -> dict | None:
+    """
+    Загружает формулы задачи и её тестовые случаи в одной сессии, минуя кэш каталога:
+    перепроверка должна видеть текущее состояние задачи.
+
+    :param task_id: ID задачи
+    :return: Словарь с ключами teacher_formula, input_variables и test_cases (в порядке ID);
+             None, если задача не найдена
+    """
+    async with Session() as session:
+        task = await session.get(Task, task_id)
+        if not task:
+            return None
+
+        test_cases = list((await session.scalars(
+            select(TestCase).filter_by(Task_id=task_id).order_by(TestCase.id)
+        )).all())
+
+    return {
+        "teacher_formula": task.teacher_formula,
+        "input_variables": task.input_variables,
+        "test_cases": test_cases
+    }
+
+
+async def add_test_cases(task_id: int, cases: list[tuple[str, str]]) -> int:
+    """
+    Добавляет тестовые случаи задачи одной транзакцией. Строки передаются в БД
+    командой COPY, а не отдельным INSERT на каждый случай.
+
+    :param task_id: ID задачи
+    :param cases: Список пар (входные данные, ожидаемый вывод), уже проверенных на длину и пустоту
+    :return: Количество добавленных тестовых случаев
+    :raises ValueError: Если задача с таким ID не найдена
+    """
+    async with Session() as session:
+        try:
+            if not await session.scalar(select(Task.id).where(Task.id == task_id)):
+                raise ValueError(f"Task with ID {task_id} not found.")
+
+            # COPY выполняется на том же соединении asyncpg, что и транзакция сессии
+            connection = await (await session.connection()).get_raw_connection()
+            await connection.driver_connection.copy_records_to_table(
+                TestCase.__tablename__,
+                records=[(input_data, output_data, task_id) for input_data, output_data in cases],
+                columns=['inp', 'out', 'Task_id'],
+            )
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            print(f"Error adding test cases: {e}")
+            raise
+
+    # Закэшированные результаты тестирования задачи больше не актуальны
+    invalidate_task_results(task_id)
+    return len(cases)
+
+
+async def get_grading_context(user_id: int, task_id: int) -> dict | None:
+    """
+    Загружает всё, что нужно для постановки решения на тестирование, в одной сессии:
+    данные задачи, зачисление пользователя на её предмет и последнее решение (одним запросом),
+    а затем тестовые случаи задачи в порядке ID.
+
+    :param user_id: ID пользователя
+    :param task_id: ID задачи
+    :return: Словарь с ключами task (id, subject_id, teacher_formula, input_variables), enrolled,
+             solution (id, code или None) и test_cases; None, если задача не найдена
+    """
+    latest_solution = (
+        select(Solution.id, Solution.code.label('code'))
+        .where(Solution.User_id == user_id, Solution.Task_id == Task.id)
+        .order_by(Solution.id.desc()).limit(1)
+        .lateral()
+    )
+    enrolled = select(association_table.c.user_id).where(
+        association_table.c.user_id == user_id, association_table.c.subject_id == Task.Subject_id
+    ).exists()
+
+    async with Session() as session:
+        context = (await session.execute(
+            select(Task.id, Task.Subject_id, Task.teacher_formula, Task.input_variables, enrolled.label('enrolled'),
+                   latest_solution.c.id.label('solution_id'), latest_solution.c.code.label('solution_code'))
+            .outerjoin(latest_solution, true())
+            .where(Task.id == task_id)
+        )).first()
+        if not context:
+            return None
+
+        # Тестовые случаи нужны, только если решение будет поставлено на тестирование
+        test_cases = []
+        if context.enrolled and context.solution_id is not None:
+            test_cases = list((await session.scalars(
+                select(TestCase).filter_by(Task_id=task_id).order_by(TestCase.id)
+            )).all())
+
+    return {
+        "task": {
+            "id": context.id,
+            "subject_id": context.Subject_id,
+            "teacher_formula": context.teacher_formula,
+            "input_variables": context.input_variables
+        },
+        "enrolled": context.enrolled,
+        "solution": {"id": context.solution_id, "code": context.solution_code}
+        if context.solution_id is not None else None,
+        "test_cases": test_cases
+    }
+
+
+async def get_user_solutions_stamp(user_id: int, task_id: int) -> tuple[int, str | None]:
+    """
+    Версионная отметка решений пользователя для задачи: меняется при загрузке решения, изменении статуса
+    (тестирование, перепроверка) или оценки. Вычисляется одним агрегатом по индексу ix_solution_user_task,
+    без чтения кода решений.
+
+    :param user_id: ID пользователя
+    :param task_id: ID задачи
+    :return: Пара (количество решений, md5 списка id:status:mark по возрастанию ID или None без решений)
+    """
+    state = func.concat(Solution.id, ':', Solution.status, ':', Solution.mark)
+    async with Session() as session:
+        row = (await session.execute(
+            select(func.count(Solution.id), func.md5(func.string_agg(state, aggregate_order_by(',', Solution.id))))
+            .where(Solution.User_id == user_id, Solution.Task_id == task_id)
+        )).one()
+    return row[0], row[1]
+
+
+async def get_user_solutions_page(user_id: int, task_id: int, limit: int, cursor: int | None = None) -> dict:
+    """
+    Возвращает страницу решений пользователя для задачи без кода (от новых к старым).
+    Страницы выбираются по ID решения (keyset-пагинация), поэтому стоимость запроса не зависит от номера страницы.
+
+    :param user_id: ID пользователя
+    :param task_id: ID задачи
+    :param limit: Размер страницы
+    :param cursor: ID, с которого начинается страница (решения с меньшим ID); None - первая страница
+    :return: Словарь с ключами solutions (список словарей id, status, mark, size), next_cursor
+             (None на последней странице) и passed (есть ли у пользователя успешное решение задачи)
+    """
+    query = (
+        select(Solution.id, Solution.status, Solution.mark, Solution.code_size.label('size'))
+        .where(Solution.User_id == user_id, Solution.Task_id == task_id)
+        .order_by(Solution.id.desc())
+        .limit(limit + 1)  # лишняя строка показывает, есть ли следующая страница
+    )
+    if cursor is not None:
+        query = query.where(Solution.id < cursor)
+
+    async with Session() as session:
+        rows = (await session.execute(query)).all()
+        passed = await session.scalar(
+            select(select(Solution.id).where(
+                Solution.User_id == user_id, Solution.Task_id == task_id, Solution.status == "Success"
+            ).exists())
+        )
+
+    solutions = [dict(row._mapping) for row in rows[:limit]]
+    return {
+        "solutions": solutions,
+        "next_cursor": solutions[-1]["id"] if len(rows) > limit else None,
+        "passed": passed
+    }
+
+
+async def get_solution(solution_id: int) -> dict | None:
+    """
+    Получает решение вместе с кодом по его ID.
+
+    :param solution_id: ID решения
+    :return: Словарь с ключами id, user_id, task_id, status, code; None, если решение не найдено
+    """
+    async with Session() as session:
+        solution = (await session.execute(
+            select(Solution.id, Solution.User_id, Solution.Task_id, Solution.status, Solution.code)
+            .where(Solution.id == solution_id)
+        )).first()
+
+    if not solution:
+        return None
+    return {
+        "id": solution.id,
+        "user_id": solution.User_id,
+        "task_id": solution.Task_id,
+        "status": solution.status,
+        "code": solution.code
+    }
+
+
+def _test_result_rows(solution_id: int, test_results: list[dict]) -> list[dict]:
+    return [
+        {
+            "passed": test_result["passed"],
+            "execution_time": test_result["execution_time"],
+            "cpu_time": test_result["cpu_time"],
+            "peak_memory": test_result["peak_memory"],
+            "output": test_result["output"][:TEST_OUTPUT_LIMIT],
+            "TestCase_id": test_result["test_case_id"],
+            "Solution_id": solution_id
+        }
+        for test_result in test_results
+    ]
+
+
+async def count_task_solutions(task_id: int) -> int:
+    """
+    Возвращает количество решений задачи.
+
+    :param task_id: ID задачи
+    :return: Количество решений
+    """
+    async with Session() as session:
+        return await session.scalar(select(func.count(Solution.id)).where(Solution.Task_id == task_id))
+
+
+async def iter_task_solutions(task_id: int, chunk_size: int):
+    """
+    Возвращает решения задачи порциями, не загружая их все в память.
+    Порции выбираются по возрастанию ID (keyset-пагинация), каждая в отдельной короткой сессии.
+
+    :param task_id: ID задачи
+    :param chunk_size: Размер порции
+    :return: Асинхронный генератор списков пар (ID решения, код решения)
+    """
+    last_id = 0
+    while True:
+        async with Session() as session:
+            chunk = (await session.execute(
+                select(Solution.id, Solution.code).where(Solution.Task_id == task_id, Solution.id > last_id)
+                .order_by(Solution.id).limit(chunk_size)
+            )).all()
+
+        if not chunk:
+            return
+        yield [(solution_id, code) for solution_id, code in chunk]
+        last_id = chunk[-1][0]
+
+
+async def save_grading_results(graded):
+    """
+    Записывает итоги тестирования нескольких решений одной транзакцией:
+    пакетно обновляет Solution и заменяет результаты тестов в TestResult.
+
+    :param graded: Список пар (словарь обновления Solution с ключами id, status, execution_time, cpu_time,
+                   peak_memory; список результатов тестов - словарей с ключами test_case_id, passed,
+                   execution_time, cpu_time, peak_memory, output)
+    :return: None
+    """
+    if not graded:
+        return
+
+    solution_ids = [solution["id"] for solution, _ in graded]
+    test_result_rows = [
+        row
+        for solution, test_results in graded
+        for row in _test_result_rows(solution["id"], test_results)
+    ]
+
+    async with Session() as session:
+        try:
+            await session.execute(update(Solution), [solution for solution, _ in graded])  # bulk UPDATE по id
+            await session.execute(delete(TestResult).where(TestResult.Solution_id.in_(solution_ids)))
+            if test_result_rows:
+                await session.execute(insert(TestResult), test_result_rows)
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            print(f"Error saving grading results: {e}")
+            raise
@@ -0,0 +1,51 @@
+import functools
+
+from app.config.config import init_config
+from app.core.cache import LRUCache
+
+cfg = init_config()['database']
+
+# Кэш каталога задач и предметов: (вид запроса, аргументы..., версия каталога) -> результат запроса.
+# add_task и add_subject увеличивают версию каталога, после чего записи прежних версий больше не читаются
+# и вытесняются по LRU; изменения из других процессов становятся видны не позже чем через TTL.
+# Закэшированные значения общие для всех запросов и не должны изменяться вызывающим кодом.
+catalogue = LRUCache(maxsize=cfg['catalogue_cache_size'], ttl=cfg['catalogue_cache_ttl'])
+
+_version = 0
+_MISSING = object()
+
+
+def version() -> int:
+    return _version
+
+
+def invalidate():
+    """
+    Сбрасывает кэш каталога после добавления или изменения задачи или предмета.
+    """
+    global _version
+    _version += 1
+    catalogue.clear()
+
+
+def cached(kind: str):
+    """
+    Декоратор асинхронной функции чтения каталога: результат кэшируется по виду запроса, позиционным
+    аргументам и версии каталога на момент вызова. None и пустой список не кэшируются: задачи и предметы
+    создаются и в других процессах, сброс кэша туда не доходит, и новая задача иначе оставалась бы
+    "не найденной" до истечения TTL.
+
+    :param kind: Вид запроса (часть ключа кэша)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args):
+            key = (kind, *args, _version)
+            value = catalogue.get(key, _MISSING)
+            if value is _MISSING:
+                value = await func(*args)
+                if value is not None and value != []:
+                    catalogue.set(key, value)
+            return value
+        return wrapper
+    return decorator
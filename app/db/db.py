@@ -1,16 +1,25 @@
+import hashlib
+import zlib
 from typing import Union
 
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, Table, Boolean, Float
+from sqlalchemy import create_engine, Column, Integer, String, LargeBinary, ForeignKey, Table, Boolean, Float, \
+    Index, UniqueConstraint, Enum, TypeDecorator, select, update, func, and_, or_, cast, text, literal_column, any_, \
+    bindparam, true
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
-from sqlalchemy.dialects.postgresql import ENUM
+from sqlalchemy.orm import relationship, sessionmaker, joinedload, column_property, undefer
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 
 from app.config.config import init_config
+from app.core.passwords import hash_password, verify_password
+from app.db import catalogue, enrollments
+from app.db.migrations import migrate
+from app.db.pool import MeteredQueuePool, pool_options
 from app.schemas.auth import RegisterRequest
 from app.schemas.subject import SubjectInfo
 from app.schemas.users import User as UserSchema
 from app.schemas.task import Task as TaskSchema
+from app.testing_pyfiles.result_cache import invalidate_task as invalidate_task_results
 import logging
 
 logging.basicConfig(level=logging.CRITICAL)  # Глобально отключить все логи, кроме критических
@@ -20,11 +29,16 @@ for logger_name in ('sqlalchemy', 'sqlalchemy.engine', 'sqlalchemy.pool'):
 # Database connection setup
 cfg = init_config()['database']
 DATABASE_URL = f"postgresql://{cfg['user']}:{cfg['password']}@{cfg['host']}:{cfg['port']}/{cfg['name']}"
-engine = create_engine(DATABASE_URL, echo=False)
+engine = create_engine(DATABASE_URL, echo=False, poolclass=MeteredQueuePool, **pool_options(cfg))
 Base = declarative_base()
 Session = sessionmaker(bind=engine)
 
-RoleTypeEnum = ENUM('admin', 'teacher', 'student', name='role_type', create_type=True)
+TEST_OUTPUT_LIMIT = 512  # Максимальная длина сохраняемого вывода теста
+TEST_CASE_DATA_LIMIT = 512  # Максимальная длина входных и выходных данных тестового случая
+
+# В схеме роль хранится как VARCHAR(10): перечисление проверяется только на стороне Python,
+# иначе asyncpg приводит параметр к несуществующему в БД типу role_type
+RoleTypeEnum = Enum('admin', 'teacher', 'student', name='role_type', native_enum=False, length=10)
 
 association_table = Table(
     'UserHasSubject',
@@ -70,6 +84,7 @@ class Subject(Base):
 
 class UserSubjectGrade(Base):
     __tablename__ = 'user_subject_grades'
+    __table_args__ = (UniqueConstraint('user_id', 'subject_id', name='uq_user_subject_grades_user_subject'),)
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('User.id'))
     subject_id = Column(Integer, ForeignKey('Subject.id'))
@@ -83,17 +98,63 @@ User.subject_grades = relationship("UserSubjectGrade", order_by=UserSubjectGrade
 Subject.user_grades = relationship("UserSubjectGrade", order_by=UserSubjectGrade.id, back_populates="subject")
 
 
+# Префикс значения CompressedText, записанного без сжатия (миграция 0005, init.sql); поток zlib начинается с 0x78
+UNCOMPRESSED_PREFIX = b'\x00'
+
+
+class CompressedText(TypeDecorator):
+    """
+    Текст, хранящийся в bytea сжатым zlib. Сжатие и распаковка выполняются при записи и чтении столбца,
+    в том числе через Solution.code и select(..., Solution.code).
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return zlib.compress(value.encode('utf-8'))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        value = bytes(value)
+        if value.startswith(UNCOMPRESSED_PREFIX):
+            return value[len(UNCOMPRESSED_PREFIX):].decode('utf-8')
+        return zlib.decompress(value).decode('utf-8')
+
+
+class SolutionSource(Base):
+    """
+    Код решений, хранящийся один раз на каждое уникальное содержимое.
+    Код сжимается приложением (CompressedText): сжатие TOAST в Postgres начинается только со строк больше ~2 КБ.
+    """
+    __tablename__ = 'SolutionSource'
+
+    # Fields
+    hash = Column(String(64), primary_key=True)  # sha256 кода в UTF-8, hex
+    code = Column('data', CompressedText, nullable=False)  # Код, сжатый zlib
+    size = Column(Integer, nullable=False)  # Размер кода в байтах без сжатия
+
+
 class Solution(Base):
     __tablename__ = 'Solution'
+    __table_args__ = (
+        Index('ix_solution_user_task', 'User_id', 'Task_id', 'id'),
+        Index('ix_solution_task', 'Task_id', 'id'),
+    )
 
     # Fields
     id = Column(Integer, primary_key=True)
-    code = Column(String, nullable=False)
+    code_hash = Column(String(64), ForeignKey('SolutionSource.hash'), nullable=False)
     mark = Column(Integer, nullable=True)
     lengthTestResult = Column(Boolean, nullable=True)
     formulaTestResult = Column(Boolean, nullable=True)
     autoTestResult = Column(Integer, nullable=True)
     status = Column(String, nullable=True)  # Новое поле
+    execution_time = Column(Float, nullable=True)  # Суммарное время выполнения тестов, с
+    cpu_time = Column(Float, nullable=True)  # Суммарное процессорное время, с
+    peak_memory = Column(Integer, nullable=True)  # Пиковый RSS при выполнении, КБ
 
     # ForeignKeys
     User_id = Column(Integer, ForeignKey('User.id'), nullable=False)
@@ -104,9 +165,23 @@ class Solution(Base):
     task = relationship('Task', back_populates='solution', uselist=False)
     testResults = relationship('TestResult', back_populates='solution')
 
+    # Код и его размер из SolutionSource. Отложенные: загрузка Solution их не читает, запросы, которым нужен код,
+    # выбирают Solution.code явно (select(..., Solution.code)) или через options(undefer(Solution.code))
+    code = column_property(
+        select(SolutionSource.code).where(SolutionSource.hash == code_hash).correlate_except(SolutionSource)
+        .scalar_subquery(),
+        deferred=True
+    )
+    code_size = column_property(
+        select(SolutionSource.size).where(SolutionSource.hash == code_hash).correlate_except(SolutionSource)
+        .scalar_subquery(),
+        deferred=True
+    )
+
 
 class Task(Base):
     __tablename__ = "Task"
+    __table_args__ = (Index('ix_task_subject', 'Subject_id'),)
 
     # Fields
     id = Column(Integer, primary_key=True)
@@ -129,11 +204,12 @@ class Task(Base):
 
 class TestCase(Base):
     __tablename__ = 'TestCase'
+    __table_args__ = (Index('ix_testcase_task', 'Task_id'),)
 
     # Fields
     id = Column(Integer, primary_key=True)
-    inp = Column(String(512), nullable=False)
-    out = Column(String(512), nullable=False)
+    inp = Column(String(TEST_CASE_DATA_LIMIT), nullable=False)
+    out = Column(String(TEST_CASE_DATA_LIMIT), nullable=False)
 
     # ForeignKeys
     Task_id = Column(Integer, ForeignKey('Task.id'), nullable=True)  # False
@@ -145,10 +221,15 @@ class TestCase(Base):
 
 class TestResult(Base):
     __tablename__ = 'TestResult'
+    __table_args__ = (Index('ix_testresult_solution', 'Solution_id'),)
 
     # Fields
     id = Column(Integer, primary_key=True)
     passed = Column(Boolean, nullable=False)
+    execution_time = Column(Float, nullable=True)
+    cpu_time = Column(Float, nullable=True)
+    peak_memory = Column(Integer, nullable=True)
+    output = Column(String(TEST_OUTPUT_LIMIT), nullable=True)  # Вывод программы, обрезанный до TEST_OUTPUT_LIMIT
 
     # ForeignKeys
     TestCase_id = Column(Integer, ForeignKey('TestCase.id'), nullable=False)
@@ -159,6 +240,139 @@ class TestResult(Base):
     solution = relationship('Solution', back_populates='testResults')
 
 
+# Запросы, общие для синхронного и асинхронного (app.db.async_db) доступа.
+# Связи пользователя с предметами проверяются одним запросом, без ленивой загрузки связей.
+
+def user_id_query(username: str):
+    # ID пользователя по имени - скалярный подзапрос для построителей ниже
+    return select(User.id).where(User.username == username).scalar_subquery()
+
+
+def user_subjects_query(user_id):
+    # (id, name, grade) дисциплин пользователя; оценка берётся коррелированным подзапросом.
+    # user_id - ID пользователя или user_id_query(username)
+    grade = select(UserSubjectGrade.grade).where(
+        UserSubjectGrade.user_id == association_table.c.user_id, UserSubjectGrade.subject_id == Subject.id
+    ).order_by(UserSubjectGrade.id).limit(1).scalar_subquery()
+    return (
+        select(Subject.id, Subject.name, grade)
+        .join(association_table, association_table.c.subject_id == Subject.id)
+        .where(association_table.c.user_id == user_id)
+        .order_by(Subject.id)
+    )
+
+
+def enrollment_query(user_id, subject_identifier: str):
+    # Одна строка (subjects, enrolled): число дисциплин пользователя и зачислен ли он на указанную.
+    # user_id - ID пользователя или user_id_query(username)
+    subject_id = association_table.c.subject_id
+    return (
+        select(
+            func.count(subject_id).label('subjects'),
+            func.count(subject_id).filter(cast(subject_id, String) == subject_identifier).label('enrolled')
+        )
+        .where(association_table.c.user_id == user_id)
+    )
+
+
+def solution_enrollment_query(user_id: int, task_id: int):
+    # Одна строка (subject_id, user_id, enrolled) для существующей задачи, иначе пустой результат
+    return (
+        select(
+            Task.Subject_id.label('subject_id'),
+            User.id.label('user_id'),
+            association_table.c.user_id.is_not(None).label('enrolled')
+        )
+        .select_from(Task)
+        .outerjoin(User, User.id == user_id)
+        .outerjoin(association_table, and_(association_table.c.user_id == User.id,
+                                           association_table.c.subject_id == Task.Subject_id))
+        .where(Task.id == task_id)
+    )
+
+
+# Профиль новых пользователей из списка группы, если в файле нет соответствующих столбцов (как в add_user)
+ROSTER_DEFAULTS = {
+    "first_name": "Иван",
+    "last_name": "Иванов",
+    "middle_name": "Иванович",
+    "form_education": "Бюджет",
+    "faculty": "Информационные системы и технологии",
+}
+
+
+def subjects_by_identifiers_query(subject_identifiers: list[str]):
+    # (id, name) дисциплин, заданных ID или именем
+    return select(Subject.id, Subject.name).where(
+        or_(Subject.name.in_(subject_identifiers), cast(Subject.id, String).in_(subject_identifiers))
+    )
+
+
+def upsert_users_query(columns: list[str]):
+    # INSERT ... ON CONFLICT (username) DO UPDATE для executemany по строкам списка группы.
+    # У существующих пользователей обновляются группа и столбцы профиля из файла; пароль и роль не меняются.
+    # RETURNING (id, inserted): xmax = 0 только у вставленных строк
+    excluded = pg_insert(User).excluded
+    return (
+        pg_insert(User)
+        .on_conflict_do_update(
+            index_elements=[User.username],
+            set_={"studyGroup": excluded.studyGroup, **{column: excluded[column] for column in columns}}
+        )
+        .returning(User.id, literal_column('xmax = 0').label('inserted'))
+    )
+
+
+def enroll_users_query(user_ids: list[int], subject_ids: list[int]):
+    # Зачисление всех пользователей на все дисциплины одним INSERT ... SELECT; существующие записи пропускаются
+    pairs = select(User.id, Subject.id).select_from(User).join(Subject, true()).where(
+        User.id == any_(bindparam('user_ids', user_ids, type_=ARRAY(Integer))),
+        Subject.id == any_(bindparam('subject_ids', subject_ids, type_=ARRAY(Integer)))
+    )
+    return (
+        pg_insert(association_table)
+        .from_select(['user_id', 'subject_id'], pairs)
+        .on_conflict_do_nothing()
+    )
+
+
+def source_hash(code: str) -> str:
+    # Ключ SolutionSource: sha256 кода в UTF-8 (совпадает с encode(sha256(...), 'hex') в миграции 0004)
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+def save_source_query(code_hash: str, code: str):
+    # Сохранение кода решения; уже сохранённое содержимое не дублируется
+    return pg_insert(SolutionSource).values(
+        hash=code_hash, code=code, size=len(code.encode('utf-8'))
+    ).on_conflict_do_nothing(index_elements=['hash'])
+
+
+def compress_solution_sources(batch_size: int = 1000) -> int:
+    """
+    Сжимает код, перенесённый миграцией 0005 без сжатия (значения с префиксом UNCOMPRESSED_PREFIX).
+    Строки обрабатываются порциями, каждая порция - отдельной транзакцией.
+
+    :param batch_size: Размер порции
+    :return: Количество сжатых записей
+    """
+    compressed = 0
+    with Session() as session:
+        while True:
+            rows = session.execute(
+                select(SolutionSource.hash, SolutionSource.code)
+                .where(func.get_byte(SolutionSource.__table__.c.data, 0) == UNCOMPRESSED_PREFIX[0])
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return compressed
+
+            # Значения распакованы при чтении и сжимаются CompressedText при записи
+            session.execute(update(SolutionSource), [{"hash": code_hash, "code": code} for code_hash, code in rows])
+            session.commit()
+            compressed += len(rows)
+
+
 def add_user_subject_grade(user_id, subject_id, grade):
     """
     Добавляет оценку пользователя за предмет.
@@ -205,7 +419,7 @@ def validate_user(username: str, password: str) -> Union[dict, bool]:
     """
     with Session() as session:
         user = session.query(User).filter_by(username=username).first()
-        if user and user.password == password:
+        if user and verify_password(password, user.password):
             return {
                 "user_id": user.id,
                 "username": user.username,
@@ -256,7 +470,7 @@ def add_user(register_data: RegisterRequest) -> Union[dict, str]:
         last_name="Иванов",
         middle_name="Иванович",
         username=register_data.username,
-        password=register_data.password,
+        password=hash_password(register_data.password),
         roleType='student',  # Default role type
         studyGroup=register_data.group_name,
         form_education='Бюджет',
@@ -311,7 +525,7 @@ def add_user_test(username, password, role_type='student', study_group='-', form
                 last_name=last_name,
                 middle_name=middle_name,
                 username=username,
-                password=password,
+                password=hash_password(password),
                 roleType=role_type,
                 studyGroup=study_group,
                 form_education=form_education,
@@ -358,6 +572,9 @@ def reg_user_in_subject(user_id, subject_identifier):
             user.subjects.append(subject)
             session.commit()
 
+            # Набор дисциплин пользователя в индексе зачислений больше не актуален
+            enrollments.invalidate_users([user_id])
+
         except Exception as e:
             session.rollback()  # Откат транзакции в случае ошибки
             print(f"Error enrolling user {user_id} in subject {subject_identifier}: {e}")
@@ -366,25 +583,15 @@ def reg_user_in_subject(user_id, subject_identifier):
 
 def get_user_subjects(username: str) -> list[SubjectInfo]:
     """
-    Получает все дисциплины, на которые зачислен пользователь по ID пользователя.
+    Получает все дисциплины, на которые зачислен пользователь, вместе с его оценками одним запросом.
 
     :param username:
     :return: Список дисциплин, на которые зачислен пользователь
-    :raises ValueError: Если пользователь с таким ID не найден
     """
     with Session() as session:
         try:
-            # Проверяем, существует ли пользователь с таким user_id
-            user = session.query(User).filter_by(username=username).first()
-            if not user:
-                return list[SubjectInfo]()
-
-            # Возвращаем список всех дисциплин, на которые зачислен пользователь
-            subjects = []
-            for subject in user.subjects:
-                grade = session.query(UserSubjectGrade).filter_by(user_id=user.id, subject_id=subject.id).first()
-                subjects.append(SubjectInfo(id=subject.id, name=subject.name, grade=(grade.grade if grade else None)))
-            return subjects
+            rows = session.execute(user_subjects_query(user_id_query(username))).all()
+            return [SubjectInfo(id=subject_id, name=name, grade=grade) for subject_id, name, grade in rows]
 
         except Exception as e:
             return list[SubjectInfo]()
@@ -421,26 +628,26 @@ def add_solution(code, user_id, task_id, mark=None, length_test_result=None, for
     if not code:
         return "Code is a required field."
 
-    # Получение subject_id по task_id
-    subject_id = get_subject_id_by_task(task_id)
-    if not subject_id:
-        return "Task not found."
-
-    # Проверка, прикреплен ли пользователь к предмету
     with Session() as session:
-        user = session.query(User).filter_by(id=user_id).first()
-        if not user:
+        # Задача, пользователь и его зачисление на предмет задачи проверяются одним запросом
+        enrollment = session.execute(solution_enrollment_query(user_id, task_id)).first()
+        if not enrollment or not enrollment.subject_id:
+            return "Task not found."
+
+        if enrollment.user_id is None:
             return "User not found."
 
-        if subject_id not in [subject.id for subject in user.subjects]:
+        if not enrollment.enrolled:
             return "User is not enrolled in the subject."
 
-    # Создание сессии
-    with Session() as session:
         try:
+            # Код сохраняется один раз на содержимое, решение ссылается на него по хэшу
+            code_hash = source_hash(code)
+            session.execute(save_source_query(code_hash, code))
+
             # Создание нового решения
             solution = Solution(
-                code=code,
+                code_hash=code_hash,
                 mark=mark,
                 lengthTestResult=length_test_result,
                 formulaTestResult=formula_test_result,
@@ -456,12 +663,25 @@ def add_solution(code, user_id, task_id, mark=None, length_test_result=None, for
             return "Error adding solution"
 
 
-def update_solution_status(solution_id: int, status: str):
+def update_solution_status(solution_id: int, status: str, execution_time: float = None, cpu_time: float = None,
+                           peak_memory: int = None):
+    """
+    Обновляет статус решения и показатели ресурсов, израсходованных при тестировании.
+
+    :param solution_id: ID решения
+    :param status: Статус тестирования
+    :param execution_time: Суммарное время выполнения тестов, с (опционально)
+    :param cpu_time: Суммарное процессорное время, с (опционально)
+    :param peak_memory: Пиковый RSS, КБ (опционально)
+    """
     with Session() as session:
         try:
             solution = session.query(Solution).filter_by(id=solution_id).first()
             if solution:
                 solution.status = status
+                solution.execution_time = execution_time
+                solution.cpu_time = cpu_time
+                solution.peak_memory = peak_memory
                 session.commit()
         except Exception as e:
             session.rollback()
@@ -480,7 +700,8 @@ def get_solutions_by_user(user_id):
     with Session() as session:
         try:
             # Получение всех решений пользователя
-            solutions = session.query(Solution).filter_by(User_id=user_id).all()
+            # (код загружается сразу: решения используются после закрытия сессии)
+            solutions = session.query(Solution).options(undefer(Solution.code)).filter_by(User_id=user_id).all()
 
             # Если решений не найдено, можно вернуть пустой список или выбросить исключение
             if not solutions:
@@ -514,6 +735,9 @@ def add_subject(name):
             new_subject = Subject(name=name)
             session.add(new_subject)
             session.commit()
+
+            # Закэшированный каталог задач и предметов больше не актуален
+            catalogue.invalidate()
         except Exception as e:
             session.rollback()  # откат в случае ошибки
             print(f"Error adding subject: {e}")
@@ -582,6 +806,9 @@ def add_task(name, subject_identifier, description=None, max_symbols_count=None,
         )
         session.add(new_task)
         session.commit()
+
+        # Закэшированный каталог больше не актуален
+        catalogue.invalidate()
     except Exception as e:
         session.rollback()
         print(f"Error adding task: {e}")
@@ -591,15 +818,15 @@ def add_task(name, subject_identifier, description=None, max_symbols_count=None,
 
 def get_latest_solution(user_id: int, task_id: int) -> Solution | None:
     """
-    Получает последнее решение пользователя для конкретной задачи.
+    Получает последнее решение пользователя для конкретной задачи вместе с кодом.
 
     :param user_id: ID пользователя
     :param task_id: ID задачи
     :return: Последнее решение пользователя, если найдено, иначе None
     """
     with Session() as session:
-        solution = session.query(Solution).filter_by(User_id=user_id, Task_id=task_id).order_by(
-            Solution.id.desc()).first()
+        solution = session.query(Solution).options(undefer(Solution.code)).filter_by(
+            User_id=user_id, Task_id=task_id).order_by(Solution.id.desc()).first()
         return solution
 
 
@@ -661,18 +888,12 @@ def is_user_enrolled_in_subject(username: str, subject_identifier: str) -> bool
     """
     with Session() as session:
         try:
-            # Проверяем, существует ли пользователь с таким username
-            user = session.query(User).filter_by(username=username).first()
-            if not user:
-                return "User not found"
-
-            user_subject_list = [str(sub.id) for sub in user.subjects]
-
-            if len(user_subject_list) == 0:
+            enrollment = session.execute(enrollment_query(user_id_query(username), subject_identifier)).one()
+            if enrollment.subjects == 0:
                 return "No subjects found"
 
             # Проверяем, зачислен ли пользователь на этот предмет
-            return subject_identifier in user_subject_list
+            return enrollment.enrolled > 0
 
         except Exception as e:
             print(f"Error checking enrollment for user {username} in subject {subject_identifier}: {e}")
@@ -707,6 +928,9 @@ def add_test_case(input_data, output_data, task_id):
             session.add(test_case)
             session.commit()
 
+            # Закэшированные результаты тестирования задачи больше не актуальны
+            invalidate_task_results(task_id)
+
         except Exception as e:
             session.rollback()  # Откат транзакции в случае ошибки
             print(f"Error adding test case: {e}")
@@ -788,7 +1012,9 @@ def get_user_solutions_by_task(user_id, task_id):
     with Session() as session:
         try:
             # Запрос решений пользователя для конкретной задачи
-            solutions = session.query(Solution).filter_by(User_id=user_id, Task_id=task_id).all()
+            # (код загружается сразу: решения используются после закрытия сессии)
+            solutions = session.query(Solution).options(undefer(Solution.code)) \
+                .filter_by(User_id=user_id, Task_id=task_id).all()
 
             # Если решения не найдены, возвращаем пустой список или выбрасываем ошибку
             if not solutions:
@@ -857,13 +1083,13 @@ def get_users_by_subject(subject_id):
     """
     with Session() as session:
         try:
-            # Получаем предмет по его ID
-            subject = session.query(Subject).filter_by(id=subject_id).first()
+            # Получаем предмет по его ID вместе с зачисленными пользователями (LEFT JOIN)
+            subject = session.query(Subject).options(joinedload(Subject.users)).filter_by(id=subject_id).first()
             if not subject:
                 raise ValueError(f"Subject with ID {subject_id} not found.")
 
-            # Получаем всех пользователей, зачисленных на данный предмет
-            users = subject.users  # Используем связь many-to-many, определенную в модели
+            # Пользователи уже загружены тем же запросом
+            users = subject.users
 
             return users  # Возвращаем список пользователей
         except Exception as e:
@@ -916,7 +1142,10 @@ def get_users():
 
 def delete_tables():
     Base.metadata.drop_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text('DROP TABLE IF EXISTS schema_migrations'))
 
 
 def create_tables():
-    Base.metadata.create_all(engine)
+    # Схема создаётся теми же миграциями, что и в рабочей БД (python -m app.migrate)
+    migrate(engine)
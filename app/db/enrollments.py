@@ -0,0 +1,45 @@
+from app.config.config import init_config
+from app.core.cache import LRUCache
+
+cfg = init_config()['database']
+
+# Индекс зачислений: user_id -> frozenset ID дисциплин пользователя.
+# Зачисления в этом процессе (reg_user_in_subject, import_roster) сбрасывают запись пользователя явно;
+# изменения из других процессов (скрипты наполнения) становятся видны не позже чем через TTL.
+enrollments = LRUCache(maxsize=cfg['enrollment_cache_size'], ttl=cfg['enrollment_cache_ttl'])
+
+# Версия индекса увеличивается при каждом сбросе: набор, прочитанный из БД до сброса, не сохраняется
+_version = 0
+
+
+def version() -> int:
+    """
+    Текущая версия индекса. Её нужно получить до чтения зачислений из БД и передать в store_subject_ids.
+    """
+    return _version
+
+
+def get_subject_ids(user_id: int) -> frozenset[int] | None:
+    return enrollments.get(user_id)
+
+
+def store_subject_ids(user_id: int, subject_ids: frozenset[int], read_version: int):
+    """
+    :param user_id: ID пользователя
+    :param subject_ids: ID дисциплин пользователя
+    :param read_version: Версия индекса на момент чтения из БД (version())
+    """
+    if read_version == _version:
+        enrollments.set(user_id, subject_ids)
+
+
+def invalidate_users(user_ids):
+    """
+    Сбрасывает записи пользователей после изменения их зачислений.
+
+    :param user_ids: ID пользователей
+    """
+    global _version
+    _version += 1
+    for user_id in user_ids:
+        enrollments.pop(user_id)
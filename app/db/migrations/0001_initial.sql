@@ -0,0 +1,77 @@
+-- Исходная схема БД (таблицы создаются, только если их ещё нет)
+CREATE TABLE IF NOT EXISTS "User"
+(
+    id             SERIAL PRIMARY KEY,
+    username       VARCHAR(64) UNIQUE NOT NULL,
+    password       VARCHAR(255)       NOT NULL,
+    "roleType"       VARCHAR(10)        NOT NULL DEFAULT 'student',
+    "studyGroup"     VARCHAR(32),
+    form_education VARCHAR(255)       NOT NULL DEFAULT 'Не указано',
+    faculty        VARCHAR(255)       NOT NULL DEFAULT 'Не указано',
+    first_name     VARCHAR(64)        NOT NULL,
+    last_name      VARCHAR(64)        NOT NULL,
+    middle_name    VARCHAR(64)
+);
+
+CREATE TABLE IF NOT EXISTS "Subject"
+(
+    id   SERIAL PRIMARY KEY,
+    name VARCHAR(64) UNIQUE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS "Task"
+(
+    id              SERIAL PRIMARY KEY,
+    name            VARCHAR(128) UNIQUE NOT NULL,
+    description     VARCHAR(2048),
+    "maxSymbolsCount" INTEGER,
+    "maxStringsCount" INTEGER,
+    construction    VARCHAR(128),
+    teacher_formula VARCHAR,
+    input_variables VARCHAR,
+    "Subject_id"    INTEGER             NOT NULL REFERENCES "Subject" (id)
+);
+
+CREATE TABLE IF NOT EXISTS "Solution"
+(
+    id                SERIAL PRIMARY KEY,
+    code              TEXT    NOT NULL,
+    mark              INTEGER,
+    "lengthTestResult"  BOOLEAN,
+    "formulaTestResult" BOOLEAN,
+    "autoTestResult"    INTEGER,
+    status            VARCHAR,
+    "User_id"         INTEGER NOT NULL REFERENCES "User" (id),
+    "Task_id"         INTEGER REFERENCES "Task" (id)
+);
+
+CREATE TABLE IF NOT EXISTS "TestCase"
+(
+    id        SERIAL PRIMARY KEY,
+    inp       VARCHAR(512) NOT NULL,
+    out       VARCHAR(512) NOT NULL,
+    "Task_id" INTEGER REFERENCES "Task" (id)
+);
+
+CREATE TABLE IF NOT EXISTS "TestResult"
+(
+    id            SERIAL PRIMARY KEY,
+    passed        BOOLEAN NOT NULL,
+    "TestCase_id" INTEGER NOT NULL REFERENCES "TestCase" (id),
+    "Solution_id" INTEGER NOT NULL REFERENCES "Solution" (id)
+);
+
+CREATE TABLE IF NOT EXISTS "UserHasSubject"
+(
+    user_id    INTEGER NOT NULL REFERENCES "User" (id),
+    subject_id INTEGER NOT NULL REFERENCES "Subject" (id),
+    PRIMARY KEY (user_id, subject_id)
+);
+
+CREATE TABLE IF NOT EXISTS "user_subject_grades"
+(
+    id         SERIAL PRIMARY KEY,
+    user_id    INTEGER NOT NULL REFERENCES "User" (id),
+    subject_id INTEGER NOT NULL REFERENCES "Subject" (id),
+    grade      FLOAT
+);
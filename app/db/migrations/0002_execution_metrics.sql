@@ -0,0 +1,11 @@
+-- Показатели ресурсов, израсходованных при тестировании решения и каждого теста
+ALTER TABLE "Solution"
+    ADD COLUMN IF NOT EXISTS execution_time FLOAT,
+    ADD COLUMN IF NOT EXISTS cpu_time FLOAT,
+    ADD COLUMN IF NOT EXISTS peak_memory INTEGER;
+
+ALTER TABLE "TestResult"
+    ADD COLUMN IF NOT EXISTS execution_time FLOAT,
+    ADD COLUMN IF NOT EXISTS cpu_time FLOAT,
+    ADD COLUMN IF NOT EXISTS peak_memory INTEGER,
+    ADD COLUMN IF NOT EXISTS output VARCHAR(512);
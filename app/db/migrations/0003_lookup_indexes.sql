@@ -0,0 +1,25 @@
+-- Индексы для частых запросов по внешним ключам
+
+-- Последнее решение пользователя по задаче (User_id, Task_id, ORDER BY id DESC)
+CREATE INDEX IF NOT EXISTS ix_solution_user_task ON "Solution" ("User_id", "Task_id", id);
+-- Решения задачи порциями по возрастанию id (перепроверка)
+CREATE INDEX IF NOT EXISTS ix_solution_task ON "Solution" ("Task_id", id);
+CREATE INDEX IF NOT EXISTS ix_task_subject ON "Task" ("Subject_id");
+CREATE INDEX IF NOT EXISTS ix_testcase_task ON "TestCase" ("Task_id");
+CREATE INDEX IF NOT EXISTS ix_testresult_solution ON "TestResult" ("Solution_id");
+
+-- Одна оценка пользователя по дисциплине: из повторяющихся остаётся первая (с наименьшим id)
+DELETE FROM "user_subject_grades" duplicate
+USING "user_subject_grades" original
+WHERE duplicate.user_id = original.user_id
+  AND duplicate.subject_id = original.subject_id
+  AND duplicate.id > original.id;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_user_subject_grades_user_subject') THEN
+        ALTER TABLE "user_subject_grades"
+            ADD CONSTRAINT uq_user_subject_grades_user_subject UNIQUE (user_id, subject_id);
+    END IF;
+END
+$$;
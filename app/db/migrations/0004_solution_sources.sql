@@ -0,0 +1,34 @@
+-- Код решений хранится один раз на каждое уникальное содержимое (ключ - sha256 кода в hex).
+-- Сжатие кода выполняется приложением, см. миграцию 0005 (toast_tuple_target не снижает порог сжатия TOAST ~2 КБ).
+CREATE TABLE IF NOT EXISTS "SolutionSource"
+(
+    hash VARCHAR(64) PRIMARY KEY,
+    code TEXT    NOT NULL,
+    size INTEGER NOT NULL
+) WITH (toast_tuple_target = 128);
+
+ALTER TABLE "Solution"
+    ADD COLUMN IF NOT EXISTS code_hash VARCHAR(64) REFERENCES "SolutionSource" (hash);
+
+-- Перенос кода существующих решений (выполняется, пока в Solution есть столбец code)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1
+               FROM information_schema.columns
+               WHERE table_schema = current_schema() AND table_name = 'Solution' AND column_name = 'code') THEN
+        INSERT INTO "SolutionSource" (hash, code, size)
+        SELECT encode(sha256(convert_to(code, 'UTF8')), 'hex'), code, octet_length(code)
+        FROM "Solution"
+        ON CONFLICT DO NOTHING;
+
+        UPDATE "Solution"
+        SET code_hash = encode(sha256(convert_to(code, 'UTF8')), 'hex')
+        WHERE code_hash IS NULL;
+
+        ALTER TABLE "Solution" DROP COLUMN code;
+    END IF;
+END
+$$;
+
+ALTER TABLE "Solution"
+    ALTER COLUMN code_hash SET NOT NULL;
@@ -0,0 +1,30 @@
+-- Код решений сжимается приложением (zlib, app.db.db.CompressedText) и хранится в bytea: сжатие TOAST в Postgres
+-- начинается только со строк больше ~2 КБ (TOAST_TUPLE_THRESHOLD) независимо от toast_tuple_target,
+-- а типичное решение короче.
+-- Код, перенесённый этой миграцией, записывается без сжатия с префиксом 0x00 (поток zlib с него не начинается);
+-- python -m app.migrate сжимает такие строки после применения миграций.
+ALTER TABLE "SolutionSource"
+    ADD COLUMN IF NOT EXISTS data BYTEA;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1
+               FROM information_schema.columns
+               WHERE table_schema = current_schema() AND table_name = 'SolutionSource' AND column_name = 'code') THEN
+        UPDATE "SolutionSource"
+        SET data = '\x00'::bytea || convert_to(code, 'UTF8')
+        WHERE data IS NULL;
+
+        ALTER TABLE "SolutionSource" DROP COLUMN code;
+    END IF;
+END
+$$;
+
+ALTER TABLE "SolutionSource"
+    ALTER COLUMN data SET NOT NULL;
+
+-- Данные уже сжаты: pglz для них не применяется, toast_tuple_target больше не нужен
+ALTER TABLE "SolutionSource"
+    ALTER COLUMN data SET STORAGE EXTERNAL;
+ALTER TABLE "SolutionSource"
+    RESET (toast_tuple_target);
@@ -0,0 +1,97 @@
+import os
+import re
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+# Миграции - SQL-файлы вида 0001_name.sql в этом каталоге, применяются по возрастанию номера.
+# Файлы должны быть идемпотентными (IF NOT EXISTS и т.п.), чтобы их можно было применить
+# и к БД, созданной скриптом init.sql.
+MIGRATIONS_DIR = os.path.dirname(__file__)
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+# Ключ advisory-блокировки: одновременно запущенные экземпляры применяют миграции по очереди
+LOCK_KEY = 0x5D0
+
+CREATE_VERSIONS_TABLE = '''
+CREATE TABLE IF NOT EXISTS schema_migrations
+(
+    version    INTEGER PRIMARY KEY,
+    name       VARCHAR(128) NOT NULL,
+    applied_at TIMESTAMP    NOT NULL DEFAULT now()
+)
+'''
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    path: str
+
+    def sql(self) -> str:
+        with open(self.path, encoding='utf-8') as file:
+            return file.read()
+
+
+def load_migrations() -> list[Migration]:
+    """
+    Находит файлы миграций.
+
+    :return: Список миграций по возрастанию версии
+    :raises ValueError: Если две миграции имеют одинаковую версию
+    """
+    migrations = {}
+    for file_name in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE.match(file_name)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version}: {file_name}")
+        migrations[version] = Migration(version, match.group(2), os.path.join(MIGRATIONS_DIR, file_name))
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def applied_versions(engine: Engine) -> set[int]:
+    """
+    Возвращает версии уже применённых миграций.
+
+    :param engine: Синхронный движок SQLAlchemy
+    :return: Множество версий
+    """
+    with engine.begin() as connection:
+        connection.execute(text(CREATE_VERSIONS_TABLE))
+        return set(connection.scalars(text("SELECT version FROM schema_migrations")))
+
+
+def migrate(engine: Engine, target: int | None = None) -> list[Migration]:
+    """
+    Применяет неприменённые миграции до версии target включительно.
+    Каждая миграция выполняется и записывается в schema_migrations в отдельной транзакции,
+    поэтому при ошибке БД остаётся на последней успешно применённой версии.
+
+    :param engine: Синхронный движок SQLAlchemy
+    :param target: Последняя применяемая версия (None - все)
+    :return: Список применённых миграций
+    """
+    applied = []
+    done = applied_versions(engine)
+    for migration in load_migrations():
+        if target is not None and migration.version > target:
+            break
+        if migration.version in done:
+            continue
+
+        with engine.begin() as connection:
+            connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+            # Другой экземпляр мог применить миграцию, пока мы ждали блокировку
+            if connection.scalar(text("SELECT 1 FROM schema_migrations WHERE version = :version"),
+                                 {"version": migration.version}):
+                continue
+            connection.exec_driver_sql(migration.sql())
+            connection.execute(text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                               {"version": migration.version, "name": migration.name})
+        applied.append(migration)
+    return applied
@@ -0,0 +1,85 @@
+import time
+
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+class _PoolStatsMixin:
+    """
+    Учёт ожидания соединений пула: сколько запросов сейчас ждут выдачи соединения
+    (свободного или вновь открываемого) и сколько времени они провели в ожидании.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._waiters = 0
+        self._max_waiters = 0
+        self._checkouts = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+
+    def recreate(self):
+        # Пул пересоздаётся при dispose(); статистика переносится в новый пул
+        pool = super().recreate()
+        pool._max_waiters = self._max_waiters
+        pool._checkouts = self._checkouts
+        pool._wait_time = self._wait_time
+        pool._max_wait_time = self._max_wait_time
+        return pool
+
+    def _do_get(self):
+        self._waiters += 1
+        self._max_waiters = max(self._max_waiters, self._waiters)
+        start_time = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait_time = time.perf_counter() - start_time
+            self._waiters -= 1
+            self._checkouts += 1
+            self._wait_time += wait_time
+            self._max_wait_time = max(self._max_wait_time, wait_time)
+
+    def stats(self) -> dict:
+        """
+        Возвращает текущее состояние пула и накопленную статистику ожидания.
+
+        :return: Словарь с ключами size, checked_in, checked_out, overflow, max_overflow, waiters,
+                 max_waiters, checkouts, wait_time, avg_wait_time, max_wait_time (время в секундах)
+        """
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),  # до заполнения пула overflow() отрицателен
+            "max_overflow": self._max_overflow,
+            "waiters": self._waiters,
+            "max_waiters": self._max_waiters,
+            "checkouts": self._checkouts,
+            "wait_time": self._wait_time,
+            "avg_wait_time": self._wait_time / self._checkouts if self._checkouts else 0.0,
+            "max_wait_time": self._max_wait_time,
+        }
+
+
+class MeteredQueuePool(_PoolStatsMixin, QueuePool):
+    pass
+
+
+class MeteredAsyncQueuePool(_PoolStatsMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(cfg: dict) -> dict:
+    """
+    Параметры пула соединений из раздела database конфигурации.
+
+    :param cfg: Раздел database файла config.json
+    :return: Именованные аргументы для create_engine / create_async_engine
+    """
+    return {
+        "pool_size": cfg['pool_size'],
+        "max_overflow": cfg['max_overflow'],
+        "pool_timeout": cfg['pool_timeout'],
+        "pool_pre_ping": cfg['pool_pre_ping'],
+        "pool_recycle": cfg['pool_recycle'],
+    }
@@ -0,0 +1,41 @@
+# Регистрация учебной группы по CSV-списку (username,password[,first_name,last_name,middle_name,form_education,faculty])
+# и зачисление её на дисциплины
+# python -m app.import_roster <study_group> <file.csv> [--subject <ID или имя> ...]
+import argparse
+import asyncio
+import json
+import sys
+
+from app.config.config import init_config
+from app.core.files.roster import RosterFileError, parse_roster
+from app.db.async_db import engine as db_engine, import_roster
+
+
+async def run(study_group: str, columns: list[str], users: list[dict], subjects: list[str]) -> dict:
+    try:
+        return await import_roster(study_group, columns, users, subjects)
+    finally:
+        await db_engine.dispose()
+
+
+def main():
+    init_config()  # load config
+
+    parser = argparse.ArgumentParser(description="Регистрация учебной группы по списку")
+    parser.add_argument("study_group", help="Учебная группа")
+    parser.add_argument("file", help="CSV-файл со столбцами username, password и необязательными столбцами профиля")
+    parser.add_argument("--subject", action="append", default=[], dest="subjects",
+                        help="ID или имя дисциплины для зачисления (можно указать несколько раз)")
+    args = parser.parse_args()
+
+    try:
+        with open(args.file, encoding='utf-8', newline='') as stream:
+            columns, users = parse_roster(stream)
+        result = asyncio.run(run(args.study_group, columns, users, args.subjects))
+    except (RosterFileError, ValueError) as e:
+        sys.exit(str(e))
+
+    print(json.dumps({"study_group": args.study_group, **result}, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# Загрузка тестовых случаев задачи из файла CSV (заголовок input,output) или JSONL
+# python -m app.import_test_cases <task_id> <file>
+import argparse
+import asyncio
+import sys
+
+from app.config.config import init_config
+from app.core.files.test_cases import TEST_CASE_FORMATS, TestCaseFileError, test_case_format, parse_test_cases
+from app.db.async_db import engine as db_engine, add_test_cases
+from app.db.db import TEST_CASE_DATA_LIMIT
+
+
+async def run(task_id: int, cases: list[tuple[str, str]]) -> int:
+    try:
+        return await add_test_cases(task_id, cases)
+    finally:
+        await db_engine.dispose()
+
+
+def main():
+    init_config()  # load config
+
+    parser = argparse.ArgumentParser(description="Загрузка тестовых случаев задачи из файла")
+    parser.add_argument("task_id", type=int, help="ID задачи")
+    parser.add_argument("file", help=f"Файл тестовых случаев ({', '.join(TEST_CASE_FORMATS)})")
+    args = parser.parse_args()
+
+    file_format = test_case_format(args.file)
+    if not file_format:
+        sys.exit(f"Invalid file type. Only {', '.join(TEST_CASE_FORMATS)} files are allowed.")
+
+    try:
+        with open(args.file, encoding='utf-8', newline='') as stream:
+            cases = parse_test_cases(stream, file_format, TEST_CASE_DATA_LIMIT)
+        imported = asyncio.run(run(args.task_id, cases))
+    except (TestCaseFileError, ValueError) as e:
+        sys.exit(str(e))
+
+    print(f"Imported {imported} test cases into task {args.task_id}.")
+
+if __name__ == '__main__':
+    main()
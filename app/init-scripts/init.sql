@@ -1,90 +1,11 @@
--- Удаление таблиц
-DROP TABLE IF EXISTS "TestResult" CASCADE;
-DROP TABLE IF EXISTS "TestCase" CASCADE;
-DROP TABLE IF EXISTS "Solution" CASCADE;
-DROP TABLE IF EXISTS "Task" CASCADE;
-DROP TABLE IF EXISTS "UserHasSubject" CASCADE;
-DROP TABLE IF EXISTS "User" CASCADE;
-DROP TABLE IF EXISTS "Subject" CASCADE;
-DROP TABLE IF EXISTS "user_subject_grades" CASCADE;
-
--- Создание таблиц
-CREATE TABLE "User"
-(
-    id             SERIAL PRIMARY KEY,
-    username       VARCHAR(64) UNIQUE NOT NULL,
-    password       VARCHAR(255)       NOT NULL,
-    "roleType"       VARCHAR(10)        NOT NULL DEFAULT 'student',
-    "studyGroup"     VARCHAR(32),
-    form_education VARCHAR(255)       NOT NULL DEFAULT 'Не указано',
-    faculty        VARCHAR(255)       NOT NULL DEFAULT 'Не указано',
-    first_name     VARCHAR(64)        NOT NULL,
-    last_name      VARCHAR(64)        NOT NULL,
-    middle_name    VARCHAR(64)
-);
-
-CREATE TABLE "Subject"
-(
-    id   SERIAL PRIMARY KEY,
-    name VARCHAR(64) UNIQUE NOT NULL
-);
-
-CREATE TABLE "Task"
-(
-    id              SERIAL PRIMARY KEY,
-    name            VARCHAR(128) UNIQUE NOT NULL,
-    description     VARCHAR(2048),
-    "maxSymbolsCount" INTEGER,
-    "maxStringsCount" INTEGER,
-    construction    VARCHAR(128),
-    teacher_formula VARCHAR,
-    input_variables VARCHAR,
-    "Subject_id"    INTEGER             NOT NULL REFERENCES "Subject" (id)
-);
-
-CREATE TABLE "Solution"
-(
-    id                SERIAL PRIMARY KEY,
-    code              TEXT    NOT NULL,
-    mark              INTEGER,
-    "lengthTestResult"  BOOLEAN,
-    "formulaTestResult" BOOLEAN,
-    "autoTestResult"    INTEGER,
-    status            VARCHAR,
-    "User_id"         INTEGER NOT NULL REFERENCES "User" (id),
-    "Task_id"         INTEGER REFERENCES "Task" (id)
-);
-
-CREATE TABLE "TestCase"
-(
-    id        SERIAL PRIMARY KEY,
-    inp       VARCHAR(512) NOT NULL,
-    out       VARCHAR(512) NOT NULL,
-    "Task_id" INTEGER REFERENCES "Task" (id)
-);
-
-CREATE TABLE "TestResult"
-(
-    id            SERIAL PRIMARY KEY,
-    passed        BOOLEAN NOT NULL,
-    "TestCase_id" INTEGER NOT NULL REFERENCES "TestCase" (id),
-    "Solution_id" INTEGER NOT NULL REFERENCES "Solution" (id)
-);
-
-CREATE TABLE "UserHasSubject"
-(
-    user_id    INTEGER NOT NULL REFERENCES "User" (id),
-    subject_id INTEGER NOT NULL REFERENCES "Subject" (id),
-    PRIMARY KEY (user_id, subject_id)
-);
-
-CREATE TABLE "user_subject_grades"
-(
-    id         SERIAL PRIMARY KEY,
-    user_id    INTEGER NOT NULL REFERENCES "User" (id),
-    subject_id INTEGER NOT NULL REFERENCES "Subject" (id),
-    grade      FLOAT
-);
+-- Начальное наполнение БД для разработки (docker-entrypoint-initdb.d).
+-- Схема создаётся миграциями из app/db/migrations; в рабочей БД они применяются командой python -m app.migrate.
+-- При добавлении миграции подключите её здесь.
+\i /docker-entrypoint-initdb.d/migrations/0001_initial.sql
+\i /docker-entrypoint-initdb.d/migrations/0002_execution_metrics.sql
+\i /docker-entrypoint-initdb.d/migrations/0003_lookup_indexes.sql
+\i /docker-entrypoint-initdb.d/migrations/0004_solution_sources.sql
+\i /docker-entrypoint-initdb.d/migrations/0005_compressed_solution_sources.sql
 
 -- Добавление пользователей
 INSERT INTO "User" (username, password, "roleType", "studyGroup", form_education, faculty, first_name, last_name, middle_name)
@@ -150,10 +71,15 @@ VALUES ('1 2 3', '0 2', 1),
        ('55 56 57', '54 110', 1),
        ('58 59 60', '57 116', 1);
 
--- Добавление решений
-INSERT INTO "Solution" (code, "User_id", "Task_id")
-VALUES ('print(''Hello, World!'')', 3, 1),
-       ('print(''Hello, World!'')', 3, 3);
+-- Добавление решений (код хранится в SolutionSource, решения ссылаются на него по sha256).
+-- Префикс 0x00 - код без сжатия (см. миграцию 0005), его сжимает python -m app.migrate
+INSERT INTO "SolutionSource" (hash, data, size)
+VALUES (encode(sha256(convert_to('print(''Hello, World!'')', 'UTF8')), 'hex'),
+        '\x00'::bytea || convert_to('print(''Hello, World!'')', 'UTF8'), 22);
+
+INSERT INTO "Solution" (code_hash, "User_id", "Task_id")
+VALUES (encode(sha256(convert_to('print(''Hello, World!'')', 'UTF8')), 'hex'), 3, 1),
+       (encode(sha256(convert_to('print(''Hello, World!'')', 'UTF8')), 'hex'), 3, 3);
 
 -- Добавление результатов тестирования
 INSERT INTO "TestResult" (passed, "TestCase_id", "Solution_id")
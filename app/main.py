@@ -2,8 +2,13 @@
 from uvicorn import run
 from fastapi import FastAPI
 from app.config.config import init_config
+from app.core.check_auth import AuthError
+from app.core import passwords
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import router as app_router
+from app.db.async_db import engine as db_engine
+from app.testing_pyfiles.executor import pool as execution_pool
+from app.testing_pyfiles.jobs import grading_queue
 
 app = FastAPI()
 
@@ -13,8 +18,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Разрешить все HTTP-методы
     allow_headers=["*"],  # Разрешить все заголовки
+    expose_headers=["ETag"],  # ETag ответов доступен фронтенду для условных запросов (If-None-Match)
 )
 
+# Ошибки авторизации из зависимости get_principal возвращаются в формате {"error": ...}
+app.add_exception_handler(AuthError, lambda request, exc: exc.response)
+
+app.add_event_handler("shutdown", grading_queue.shutdown)  # stop grading job workers
+app.add_event_handler("shutdown", execution_pool.shutdown)  # stop grading worker processes
+app.add_event_handler("shutdown", passwords.shutdown)  # stop password hashing threads
+app.add_event_handler("shutdown", db_engine.dispose)  # close database connections
+
 
 def main():
     app.include_router(app_router)  # include all routers
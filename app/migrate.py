@@ -0,0 +1,39 @@
+# Применение миграций схемы БД из командной строки
+# python -m app.migrate [--target N] [--status]
+import argparse
+
+from app.db.db import engine, compress_solution_sources
+from app.db.migrations import load_migrations, applied_versions, migrate
+
+COMPRESSED_SOURCES_VERSION = 5  # 0005_compressed_solution_sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Применение миграций схемы БД")
+    parser.add_argument("--target", type=int, default=None, help="Последняя применяемая версия (по умолчанию все)")
+    parser.add_argument("--status", action="store_true", help="Показать применённые и ожидающие миграции")
+    args = parser.parse_args()
+
+    try:
+        if args.status:
+            done = applied_versions(engine)
+            for migration in load_migrations():
+                state = "applied" if migration.version in done else "pending"
+                print(f"{migration.version:04d} {migration.name}: {state}")
+            return
+
+        applied = migrate(engine, args.target)
+        for migration in applied:
+            print(f"Applied {migration.version:04d} {migration.name}")
+        if not applied:
+            print("Database schema is up to date.")
+
+        # Код решений, перенесённый миграцией 0005 без сжатия, сжимается на стороне приложения
+        compressed = compress_solution_sources() if COMPRESSED_SOURCES_VERSION in applied_versions(engine) else 0
+        if compressed:
+            print(f"Compressed {compressed} solution sources")
+    finally:
+        engine.dispose()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+# Перепроверка всех решений задачи из командной строки
+# python -m app.regrade <task_id> [--chunk-size N]
+import argparse
+import asyncio
+import json
+
+from app.config.config import init_config
+from app.db.async_db import engine as db_engine
+from app.testing_pyfiles.executor import pool as execution_pool
+from app.testing_pyfiles.test import regrade_task
+
+
+async def run(task_id: int, chunk_size: int):
+    try:
+        async for progress in regrade_task(task_id, chunk_size):
+            print(json.dumps(progress), flush=True)
+    finally:
+        execution_pool.shutdown()
+        await db_engine.dispose()
+
+
+def main():
+    cfg = init_config()  # load config
+
+    parser = argparse.ArgumentParser(description="Перепроверка всех решений задачи")
+    parser.add_argument("task_id", type=int, help="ID задачи")
+    parser.add_argument("--chunk-size", type=int, default=cfg['grader']['regrade_chunk_size'],
+                        help="Количество решений, проверяемых и записываемых за один раз")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.task_id, args.chunk_size))
+
+if __name__ == '__main__':
+    main()
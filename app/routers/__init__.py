@@ -3,6 +3,7 @@ from .auth import router as auth_router
 from .files import router as files_router
 from .users import router as users_router
 from .subjects import router as subjects_router
+from .monitoring import router as monitoring_router
 from .files import router as files_router
 
 router = APIRouter()
@@ -10,4 +11,5 @@ router.include_router(auth_router)
 router.include_router(files_router)
 router.include_router(users_router)
 router.include_router(subjects_router)
+router.include_router(monitoring_router)
 router.include_router(files_router)
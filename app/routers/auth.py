@@ -6,19 +6,34 @@ from http import HTTPStatus
 
 from app.config.config import init_config
 from app.core.jwt_handler import create_access_token
-from app.db.db import validate_user, add_user
+from app.core.passwords import TooManyPasswordChecks
+from app.db.async_db import validate_user, add_user, get_user_id
 from app.schemas.auth import LoginRequest, LoginResponse, RegisterRequest, RegisterResponse
 
 router = APIRouter()
 cfg = init_config()['jwt']
+auth_cfg = init_config()['auth']
+
+
+def too_many_password_checks() -> JSONResponse:
+    return JSONResponse(
+        status_code=HTTPStatus.TOO_MANY_REQUESTS,
+        content={"error": "Too many login attempts. Try again later."},
+        headers={"Retry-After": str(auth_cfg['retry_after'])}
+    )
 
 
 @router.post("/login", response_model=LoginResponse, summary="Авторизация пользователя")
 async def login(request: LoginRequest):
-    user_data = validate_user(
-        username=request.username,
-        password=request.password
-    )
+    # Пароль проверяется в пуле хэширования, не блокируя обработку остальных запросов
+    try:
+        user_data = await validate_user(
+            username=request.username,
+            password=request.password
+        )
+    except TooManyPasswordChecks:
+        return too_many_password_checks()
+
     # if already exists in db
     if not user_data:
         return JSONResponse(
@@ -37,19 +52,18 @@ async def login(request: LoginRequest):
 
 @router.post("/register", response_model=RegisterResponse, summary="Регистрация пользователя")
 async def register(request: RegisterRequest):
-    user_data = validate_user(
-        username=request.username,
-        password=request.password
-    )
-    # if not exists in db
-    if user_data:
+    # if not exists in db (проверяется только имя, без проверки пароля)
+    if await get_user_id(request.username) is not None:
         return JSONResponse(
             status_code=HTTPStatus.BAD_REQUEST,
             content={"error": "User already exists"}
         )
 
-    # add user to db
-    res_data = add_user(request)
+    # add user to db (пароль хэшируется в пуле хэширования)
+    try:
+        res_data = await add_user(request)
+    except TooManyPasswordChecks:
+        return too_many_password_checks()
     if isinstance(res_data, str):
         return JSONResponse(
             status_code=HTTPStatus.BAD_REQUEST,
@@ -57,6 +71,7 @@ async def register(request: RegisterRequest):
         )
 
     jwt_data = {
+        "user_id": res_data.get('user_id'),
         "username": res_data.get('username'),
         "roletype": res_data.get('roletype'),
         "studygroup": res_data.get('studygroup')
@@ -1,29 +1,71 @@
+import io
+import json
 from typing import Union
 
-from fastapi import APIRouter, Header, UploadFile, File, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, Depends, Query, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from http import HTTPStatus
 
-from app.core.check_auth import check_auth
+from app.core.check_auth import Principal, get_principal
+from app.core.etag import make_etag, etag_matches, etag_headers, not_modified
 from app.core.files.files import check_type
-from app.db.db import add_solution, get_subject_id_by_task, is_user_enrolled_in_subject, get_task_data, \
-    get_latest_solution, get_user_solutions_by_task
-from app.schemas.files import ResponseUpload
+from app.core.files.test_cases import TEST_CASE_FORMATS, TestCaseFileError, test_case_format, parse_test_cases
+from app.db.async_db import add_solution, get_subject_id_by_task, is_user_enrolled_in_subject, get_task_data, \
+    get_grading_context, get_user_solutions_page, get_user_solutions_stamp, get_solution, add_test_cases
+from app.db.db import TEST_CASE_DATA_LIMIT
+from app.config.config import init_config
+from app.schemas.files import ResponseUpload, ResponseTestCasesImport
+from app.schemas.jobs import JobCreated, JobStatus
 from app.schemas.others import Error
-from app.schemas.task import TaskInfo, SolutionInfo
+from app.schemas.task import TaskInfo, SolutionInfo, SolutionCode
 from app.schemas.test import ResponseTest
-from app.testing_pyfiles.test import check_file
+from app.testing_pyfiles.jobs import grading_queue, QueueFull
+from app.testing_pyfiles.result_cache import result_key
+from app.testing_pyfiles.test import regrade_task
 
 router = APIRouter()
+cfg = init_config()['grader']
+
+SOLUTIONS_PAGE_SIZE = 20  # Решений на странице /task/{task_id} по умолчанию
+SOLUTIONS_PAGE_SIZE_MAX = 100
+
+
+async def check_teacher_access(principal: Principal, task_id: int, action: str) -> JSONResponse | None:
+    """
+    Проверяет, что пользователь может управлять задачей: администратор - любой,
+    преподаватель - только задачами предметов, на которые он записан.
+
+    :param principal: Пользователь запроса
+    :param task_id: ID задачи
+    :param action: Действие для текста ошибки ("regrade solutions", ...)
+    :return: Ответ с ошибкой или None, если доступ разрешён
+    """
+    if principal.role not in ('teacher', 'admin'):
+        return JSONResponse(
+            status_code=HTTPStatus.FORBIDDEN,
+            content={"error": f"Only teachers can {action}."}
+        )
+
+    subject_id = await get_subject_id_by_task(task_id)
+    if not subject_id:
+        return JSONResponse(
+            status_code=HTTPStatus.NOT_FOUND,
+            content={"error": "Task not found."}
+        )
+
+    if principal.role == 'teacher' and \
+            await is_user_enrolled_in_subject(principal.user_id, str(subject_id)) is not True:
+        return JSONResponse(
+            status_code=HTTPStatus.FORBIDDEN,
+            content={"error": "User is not enrolled in the subject."}
+        )
+    return None
 
 
 # Загрузка решения задачи по task_id
 @router.post("/upload/{task_id}", response_model=ResponseUpload, summary="Загрузка кода для лабораторной работы")
-async def upload_solution(task_id: int, authorization: str = Header(...), file: UploadFile = File(...)):
-    check_data = check_auth(authorization)
-    if isinstance(check_data, JSONResponse):
-        return check_data
-
+async def upload_solution(task_id: int, principal: Principal = Depends(get_principal), file: UploadFile = File(...)):
     # Проверка типа файла
     check_file = check_type(file)
     if not check_file[0]:
@@ -35,9 +77,9 @@ async def upload_solution(task_id: int, authorization: str = Header(...), file:
     file_content = await file.read()
 
     # Добавление решения в БД
-    res_add_solution = add_solution(
+    res_add_solution = await add_solution(
         code=file_content.decode('utf-8'),
-        user_id=check_data['user_id'],
+        user_id=principal.user_id,
         task_id=task_id,
         mark=None,
         length_test_result=None,
@@ -60,108 +102,189 @@ async def upload_solution(task_id: int, authorization: str = Header(...), file:
     )
 
 
-# Тестирование файла
-@router.post("/test/{task_id}", response_model=ResponseTest, summary="Тестирование лабораторной работы")
-async def test_solution(task_id: int, authorization: str = Header(...)):
-    check_data = check_auth(authorization)
-    if isinstance(check_data, JSONResponse):
-        return check_data
-
-    # Проверка, что пользователь принадлежит предмету, к которому относится задача
-    subject_id = get_subject_id_by_task(task_id)
-    if not subject_id:
+# Тестирование файла: решение ставится в очередь, результат доступен по /jobs/{job_id}
+@router.post("/test/{task_id}", response_model=JobCreated, status_code=HTTPStatus.ACCEPTED,
+             summary="Тестирование лабораторной работы")
+async def test_solution(task_id: int, principal: Principal = Depends(get_principal)):
+    # Задача, зачисление на её предмет, последнее решение и тестовые случаи загружаются одной сессией
+    context = await get_grading_context(principal.user_id, task_id)
+    if not context:
         return JSONResponse(
             status_code=HTTPStatus.NOT_FOUND,
             content={"error": "Task not found."}
         )
 
-    user_enrolled = is_user_enrolled_in_subject(check_data['username'], str(subject_id))
-    if not user_enrolled:
+    # Проверка, что пользователь принадлежит предмету, к которому относится задача
+    if not context['enrolled']:
         return JSONResponse(
             status_code=HTTPStatus.FORBIDDEN,
             content={"error": "User is not enrolled in the subject."}
         )
 
-    # Получение данных задачи
-    task_data = get_task_data(task_id)
-    if not task_data:
+    # Последнее решение пользователя
+    latest_solution = context['solution']
+    if not latest_solution:
         return JSONResponse(
             status_code=HTTPStatus.NOT_FOUND,
-            content={"error": "Task data not found."}
+            content={"error": "Solution not found."}
         )
 
-    # Получение последнего решения пользователя
-    latest_solution = get_latest_solution(check_data['user_id'], task_id)
-    if not latest_solution:
+    # Постановка тестирования в очередь. Ключ кэша результатов берётся по тем же тестовым случаям,
+    # что загружены сейчас: тесты, импортированные за время ожидания в очереди, не влияют на задание
+    try:
+        job = grading_queue.submit(
+            principal.user_id,
+            task_id,
+            teacher_formula=context['task']['teacher_formula'],
+            input_variables=context['task']['input_variables'],
+            student_code=latest_solution['code'],
+            solution_id=latest_solution['id'],
+            test_cases=context['test_cases'],
+            cache_key=result_key(task_id, latest_solution['code'], context['test_cases'])
+        )
+    except QueueFull:
+        return JSONResponse(
+            status_code=HTTPStatus.TOO_MANY_REQUESTS,
+            content={"error": "Grading queue is full. Try again later."},
+            headers={"Retry-After": str(cfg['retry_after'])}
+        )
+
+    return JSONResponse(
+        status_code=HTTPStatus.ACCEPTED,
+        content=JobCreated(
+            job_id=job.id,
+            status=job.status,
+        ).model_dump()
+    )
+
+
+# Получение статуса задания на тестирование
+@router.get("/jobs/{job_id}", response_model=JobStatus, summary="Получение статуса тестирования")
+async def get_job_status(job_id: str, principal: Principal = Depends(get_principal)):
+    job = grading_queue.get(job_id)
+    if not job or job.user_id != principal.user_id:
         return JSONResponse(
             status_code=HTTPStatus.NOT_FOUND,
-            content={"error": "Solution not found."}
+            content={"error": "Job not found."}
         )
 
-    # Выполнение тестирования
-    res_check = await check_file(
-        task_id,
-        task_data['teacher_formula'],
-        task_data['input_variables'],
-        latest_solution.code,
-        latest_solution.id
+    result = None
+    if job.result:
+        result = ResponseTest(
+            status=job.result.execution_status,
+            formulas_output=job.result.formulas_output,
+            code_output=job.result.code_output,
+            execution_time=job.result.execution_time,
+            cpu_time=job.result.cpu_time,
+            peak_memory=job.result.peak_memory,
+            code_length=job.result.code_length,
+        )
+
+    return JSONResponse(
+        status_code=HTTPStatus.OK,
+        content=JobStatus(
+            job_id=job.id,
+            task_id=job.task_id,
+            status=job.status,
+            error=job.error,
+            result=result,
+        ).model_dump()
     )
 
-    if res_check.execution_status == "Failed":
+
+# Перепроверка всех решений задачи (для преподавателя), прогресс передаётся построчно в формате NDJSON
+@router.post("/regrade/{task_id}", summary="Перепроверка всех решений лабораторной работы")
+async def regrade_solutions(task_id: int, principal: Principal = Depends(get_principal)):
+    # Преподаватель может перепроверять только задачи своих предметов
+    access_error = await check_teacher_access(principal, task_id, "regrade solutions")
+    if access_error:
+        return access_error
+
+    async def progress_stream():
+        async for progress in regrade_task(task_id, cfg['regrade_chunk_size']):
+            yield json.dumps(progress) + "\n"
+
+    return StreamingResponse(progress_stream(), media_type="application/x-ndjson")
+
+
+# Загрузка тестовых случаев задачи из файла CSV (заголовок input,output) или JSONL (для преподавателя).
+# Файл проверяется целиком, и при любой ошибке ни один случай не добавляется.
+@router.post("/test_cases/{task_id}", response_model=ResponseTestCasesImport,
+             summary="Загрузка тестовых случаев лабораторной работы из файла")
+async def import_test_cases(task_id: int, principal: Principal = Depends(get_principal), file: UploadFile = File(...)):
+    access_error = await check_teacher_access(principal, task_id, "import test cases")
+    if access_error:
+        return access_error
+
+    file_format = test_case_format(file.filename)
+    if not file_format:
         return JSONResponse(
             status_code=HTTPStatus.BAD_REQUEST,
-            content=ResponseTest(
-                status=res_check.execution_status,
-                formulas_output=res_check.formulas_output,
-                code_output=res_check.code_output,
-                execution_time=res_check.execution_time,
-                code_length=res_check.code_length,
-            ).model_dump()
+            content={"error": f"Invalid file type. Only {', '.join(TEST_CASE_FORMATS)} files are allowed."}
+        )
+
+    # Файл читается построчно из временного файла загрузки, без чтения целиком в память.
+    # Разбор выполняется в пуле потоков, чтобы не останавливать event loop на время чтения файла
+    try:
+        stream = io.TextIOWrapper(file.file, encoding='utf-8', newline='')
+        cases = await run_in_threadpool(parse_test_cases, stream, file_format, TEST_CASE_DATA_LIMIT)
+    except (TestCaseFileError, UnicodeDecodeError) as e:
+        return JSONResponse(
+            status_code=HTTPStatus.BAD_REQUEST,
+            content={"error": str(e)}
+        )
+
+    try:
+        imported = await add_test_cases(task_id, cases)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=HTTPStatus.NOT_FOUND,
+            content={"error": str(e)}
         )
 
     return JSONResponse(
         status_code=HTTPStatus.OK,
-        content=ResponseTest(
-            status=res_check.execution_status,
-            formulas_output=res_check.formulas_output,
-            code_output=res_check.code_output,
-            execution_time=res_check.execution_time,
-            code_length=res_check.code_length,
+        content=ResponseTestCasesImport(
+            task_id=task_id,
+            imported=imported,
         ).model_dump()
     )
 
 
-# Получение информации о задаче по task_id и информация о том, сдал ли пользователь
-# хотя бы одно правильное решение
+# Получение информации о задаче по task_id, информация о том, сдал ли пользователь
+# хотя бы одно правильное решение, и страница его решений (без кода, от новых к старым)
 @router.get("/task/{task_id}", response_model=Union[Error, TaskInfo],
-            summary="Получение информации о лабораторной работе и всех ее загруженных решениях")
-async def get_task_info(task_id: int, authorization: str = Header(...)):
-    check_data = check_auth(authorization)
-    if isinstance(check_data, JSONResponse):
-        return check_data
-
+            summary="Получение информации о лабораторной работе и ее загруженных решениях")
+async def get_task_info(task_id: int, principal: Principal = Depends(get_principal),
+                        limit: int = Query(SOLUTIONS_PAGE_SIZE, ge=1, le=SOLUTIONS_PAGE_SIZE_MAX),
+                        cursor: int | None = None, if_none_match: str | None = Header(None)):
     # Получение данных задачи
-    task_data = get_task_data(task_id)
+    task_data = await get_task_data(task_id)
     if not task_data:
         return JSONResponse(
             status_code=HTTPStatus.NOT_FOUND,
             content={"error": "Task not found."}
         )
 
-    # Получение решений пользователя для задачи
-    user_solutions = get_user_solutions_by_task(check_data['user_id'], task_id)
-    if not user_solutions:
+    # Версия решений пользователя одним агрегатом; неизменившаяся страница не запрашивается и не формируется
+    solutions_count, solutions_stamp = await get_user_solutions_stamp(principal.user_id, task_id)
+    if not solutions_count and cursor is None:
         return JSONResponse(
             status_code=HTTPStatus.NOT_FOUND,
             content=Error(message="No solutions found for this task.").model_dump()
         )
 
-    # Проверка, есть ли хотя бы одно успешное решение
-    passed_solutions = [sol for sol in user_solutions if sol.status == "Success"]
-    status = "Success" if passed_solutions else "Failed"
+    etag = make_etag(task_data, solutions_stamp, limit, cursor)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    # Получение страницы решений пользователя для задачи
+    page = await get_user_solutions_page(principal.user_id, task_id, limit, cursor)
+
+    # Есть ли хотя бы одно успешное решение (по всем решениям, а не только по странице)
+    status = "Success" if page['passed'] else "Failed"
 
     # Формирование ответа
-    solutions_info = [SolutionInfo(code=sol.code, status=sol.status) for sol in user_solutions]
     return JSONResponse(
         status_code=HTTPStatus.OK,
         content=TaskInfo(
@@ -169,6 +292,29 @@ async def get_task_info(task_id: int, authorization: str = Header(...)):
             name=task_data['name'],
             description=task_data['description'],
             status=status,
-            solutions=solutions_info,
+            solutions=[SolutionInfo(**solution) for solution in page['solutions']],
+            next_cursor=page['next_cursor'],
+        ).model_dump(),
+        headers=etag_headers(etag)
+    )
+
+
+# Получение кода решения по solution_id (только для автора решения)
+@router.get("/solution/{solution_id}", response_model=SolutionCode, summary="Получение кода решения")
+async def get_solution_code(solution_id: int, principal: Principal = Depends(get_principal)):
+    solution = await get_solution(solution_id)
+    if not solution or solution['user_id'] != principal.user_id:
+        return JSONResponse(
+            status_code=HTTPStatus.NOT_FOUND,
+            content={"error": "Solution not found."}
+        )
+
+    return JSONResponse(
+        status_code=HTTPStatus.OK,
+        content=SolutionCode(
+            id=solution['id'],
+            task_id=solution['task_id'],
+            status=solution['status'],
+            code=solution['code'],
         ).model_dump()
     )
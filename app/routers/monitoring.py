@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from http import HTTPStatus
+
+from app.core.check_auth import Principal, get_principal
+from app.core.jwt_handler import tokens
+from app.db.async_db import engine as async_engine
+from app.db.catalogue import catalogue
+from app.db.enrollments import enrollments
+from app.db.db import engine as sync_engine
+from app.schemas.monitoring import DatabasePoolStats, CachesStats
+from app.testing_pyfiles.formulas import task_formulas
+from app.testing_pyfiles.result_cache import results
+
+router = APIRouter()
+
+
+def check_admin(principal: Principal) -> JSONResponse | None:
+    if principal.role != 'admin':
+        return JSONResponse(
+            status_code=HTTPStatus.FORBIDDEN,
+            content={"error": "Only administrators can view monitoring data."}
+        )
+    return None
+
+
+# Состояние пулов соединений с БД (для администратора)
+@router.get("/monitoring/db_pool", response_model=DatabasePoolStats, summary="Статистика пулов соединений с БД")
+async def get_db_pool_stats(principal: Principal = Depends(get_principal)) -> JSONResponse:
+    access_error = check_admin(principal)
+    if access_error:
+        return access_error
+
+    return JSONResponse(
+        status_code=HTTPStatus.OK,
+        content=DatabasePoolStats(
+            async_pool=async_engine.pool.stats(),
+            sync_pool=sync_engine.pool.stats(),
+        ).model_dump()
+    )
+
+
+# Размер и попадания in-process кэшей (для администратора)
+@router.get("/monitoring/caches", response_model=CachesStats, summary="Статистика кэшей приложения")
+async def get_caches_stats(principal: Principal = Depends(get_principal)) -> JSONResponse:
+    access_error = check_admin(principal)
+    if access_error:
+        return access_error
+
+    return JSONResponse(
+        status_code=HTTPStatus.OK,
+        content=CachesStats(
+            tokens=tokens.stats(),
+            results=results.stats(),
+            formulas=task_formulas.stats(),
+            enrollments=enrollments.stats(),
+            catalogue=catalogue.stats(),
+        ).model_dump()
+    )
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Header
+from fastapi import APIRouter, Depends, Header
 from fastapi.responses import JSONResponse
 from http import HTTPStatus
 
-from app.core.check_auth import check_auth
+from app.core.check_auth import Principal, get_principal
+from app.core.etag import make_etag, etag_matches, etag_headers, not_modified
 
-from app.db.db import get_user_subjects, is_user_enrolled_in_subject, get_tasks_by_subject
+from app.db.async_db import get_user_subjects, is_user_enrolled_in_subject, get_tasks_by_subject
 from app.schemas.subject import SubjectInfo
 from app.schemas.task import Task
 
@@ -13,26 +14,26 @@ router = APIRouter()
 
 # return user subjects [[1, "Python", 5], [2, "C++", 7]] or "Subjects not found" | [id, name, grade]
 @router.get("/subjects", response_model=list[SubjectInfo], summary="Получение всех предметов пользователя")
-async def get_subjects(authorization: str = Header(...)) -> JSONResponse:
-    check_data = check_auth(authorization)
-    if isinstance(check_data, JSONResponse):
-        return check_data
+async def get_subjects(principal: Principal = Depends(get_principal),
+                       if_none_match: str | None = Header(None)) -> JSONResponse:
+    user_subjects = await get_user_subjects(principal.user_id)
 
-    user_subjects = get_user_subjects(check_data['username'])
+    # Список дисциплин с оценками - один короткий запрос, ETag считается по его строкам
+    etag = make_etag([(subject.id, subject.name, subject.grade) for subject in user_subjects])
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
 
     return JSONResponse(
         status_code=HTTPStatus.OK,
-        content=user_subjects
+        content=[subject.model_dump() for subject in user_subjects],
+        headers=etag_headers(etag)
     )
 
 # return tasks of subject by subject_id
 @router.get("/tasks/{subject_identifier}", response_model=list[Task], summary="Получение лабораторных работ предмета")
-async def get_tasks(subject_identifier: str, authorization: str = Header(...)) -> JSONResponse:
-    check_data = check_auth(authorization)
-    if isinstance(check_data, JSONResponse):
-        return check_data
-
-    user_subjects = is_user_enrolled_in_subject(check_data['username'], subject_identifier)
+async def get_tasks(subject_identifier: str, principal: Principal = Depends(get_principal),
+                    if_none_match: str | None = Header(None)) -> JSONResponse:
+    user_subjects = await is_user_enrolled_in_subject(principal.user_id, subject_identifier)
 
     # Если пользователь не прикреплен к дисциплине или дисциплина не найдена
     if isinstance(user_subjects, str):
@@ -41,9 +42,14 @@ async def get_tasks(subject_identifier: str, authorization: str = Header(...)) -
             content={"error": user_subjects}
         )
 
-    subject_tasks = get_tasks_by_subject(subject_identifier)
+    # Задачи берутся из кэша каталога, поэтому неизменившийся список проверяется без запросов к БД
+    subject_tasks = await get_tasks_by_subject(subject_identifier)
+    etag = make_etag(user_subjects, [(task.id, task.name, task.description) for task in subject_tasks])
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
 
     return JSONResponse(
         status_code=HTTPStatus.OK,
-        content=subject_tasks
+        content=[task.model_dump() for task in subject_tasks],
+        headers=etag_headers(etag)
     )
@@ -1,23 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+import io
+
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from http import HTTPStatus
 
-from app.core.check_auth import check_auth
-from app.db.db import get_user_data
-from app.schemas.users import UserStatus, User
+from app.core.check_auth import Principal, get_principal
+from app.core.files.roster import RosterFileError, parse_roster
+from app.db.async_db import get_user_data, import_roster
+from app.schemas.users import UserStatus, User, RosterImport
 
 router = APIRouter()
 
 
-def get_user_status(authorization: str = Header(...)) -> JSONResponse:
-    check_data = check_auth(authorization)
-    if isinstance(check_data, JSONResponse):
-        return check_data
-
+def get_user_status(principal: Principal = Depends(get_principal)) -> JSONResponse:
     return JSONResponse(
         status_code=HTTPStatus.OK,
         content=UserStatus(
-            status=check_data['roletype'],
+            status=principal.role,
         ).model_dump()
     )
 
@@ -28,15 +28,54 @@ async def user_status(data_request: dict = Depends(get_user_status)):
 
 
 @router.get("/user_data", response_model=User, summary="Получение данных пользователя")
-async def user_data(authorization: str = Header(...)) -> JSONResponse:
-    check_data = check_auth(authorization)
-    if isinstance(check_data, JSONResponse):
-        return check_data
-
-    # Assuming you have a function to get user data from the decoded token
-    user_data = get_user_data(check_data['username'])
+async def user_data(principal: Principal = Depends(get_principal)) -> JSONResponse:
+    # Данные пользователя по ID из токена (поиск по первичному ключу)
+    user_data = await get_user_data(principal.user_id)
 
     return JSONResponse(
         status_code=HTTPStatus.OK,
         content=user_data.model_dump()
     )
+
+
+# Регистрация списка учебной группы из CSV-файла (username,password[,first_name,...]) и зачисление
+# всех пользователей группы на дисциплины (для администратора)
+@router.post("/users/roster", response_model=RosterImport, summary="Регистрация учебной группы по списку")
+async def upload_roster(principal: Principal = Depends(get_principal), file: UploadFile = File(...),
+                        study_group: str = Form(..., max_length=32), subjects: list[str] = Form([])) -> JSONResponse:
+    if principal.role != 'admin':
+        return JSONResponse(
+            status_code=HTTPStatus.FORBIDDEN,
+            content={"error": "Only administrators can import rosters."}
+        )
+
+    if not file.filename.endswith('.csv'):
+        return JSONResponse(
+            status_code=HTTPStatus.BAD_REQUEST,
+            content={"error": "Invalid file type. Only .csv files are allowed."}
+        )
+
+    # Разбор файла выполняется в пуле потоков, чтобы не останавливать event loop
+    try:
+        columns, users = await run_in_threadpool(parse_roster, io.TextIOWrapper(file.file, encoding='utf-8', newline=''))
+    except (RosterFileError, UnicodeDecodeError) as e:
+        return JSONResponse(
+            status_code=HTTPStatus.BAD_REQUEST,
+            content={"error": str(e)}
+        )
+
+    try:
+        result = await import_roster(study_group, columns, users, subjects)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=HTTPStatus.NOT_FOUND,
+            content={"error": str(e)}
+        )
+
+    return JSONResponse(
+        status_code=HTTPStatus.OK,
+        content=RosterImport(
+            study_group=study_group,
+            **result,
+        ).model_dump()
+    )
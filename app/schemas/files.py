@@ -1,4 +1,8 @@
 from pydantic import BaseModel
 
 class ResponseUpload(BaseModel):
-    task_id: int
\ No newline at end of file
+    task_id: int
+
+class ResponseTestCasesImport(BaseModel):
+    task_id: int
+    imported: int
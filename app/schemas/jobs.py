@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+
+from app.schemas.test import ResponseTest
+
+class JobCreated(BaseModel):
+    job_id: str
+    status: str
+
+class JobStatus(BaseModel):
+    job_id: str
+    task_id: int
+    status: str
+    error: str | None = None
+    result: ResponseTest | None = None
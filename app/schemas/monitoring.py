@@ -0,0 +1,35 @@
+from pydantic import BaseModel
+
+
+class PoolStats(BaseModel):
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    max_overflow: int
+    waiters: int
+    max_waiters: int
+    checkouts: int
+    wait_time: float
+    avg_wait_time: float
+    max_wait_time: float
+
+
+class DatabasePoolStats(BaseModel):
+    async_pool: PoolStats  # пул обработчиков запросов и тестирования (app.db.async_db)
+    sync_pool: PoolStats  # пул скриптов администрирования (app.db.db)
+
+
+class CacheStats(BaseModel):
+    size: int
+    maxsize: int
+    hits: int
+    misses: int
+
+
+class CachesStats(BaseModel):
+    tokens: CacheStats  # проверенные JWT-токены (app.core.jwt_handler)
+    results: CacheStats  # результаты тестирования (app.testing_pyfiles.result_cache)
+    formulas: CacheStats  # разобранные формулы задач (app.testing_pyfiles.formulas)
+    enrollments: CacheStats  # индекс зачислений пользователей (app.db.enrollments)
+    catalogue: CacheStats  # каталог задач и предметов (app.db.catalogue)
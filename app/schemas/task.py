@@ -1,8 +1,16 @@
 from pydantic import BaseModel
 
 class SolutionInfo(BaseModel):
+    id: int
+    status: str | None = None  # None, пока решение не протестировано
+    mark: int | None = None
+    size: int  # Размер кода в байтах
+
+class SolutionCode(BaseModel):
+    id: int
+    task_id: int
+    status: str | None = None
     code: str
-    status: str
 
 class TaskInfo(BaseModel):
     id: int
@@ -10,6 +18,7 @@ class TaskInfo(BaseModel):
     description: str
     status: str
     solutions: list[SolutionInfo]
+    next_cursor: int | None = None  # Передаётся в cursor для получения следующей страницы решений
 
 class Task(BaseModel):
     id: int
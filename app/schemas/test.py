@@ -5,4 +5,6 @@ class ResponseTest(BaseModel):
     formulas_output: str
     code_output: str
     execution_time: float
+    cpu_time: float = 0.0
+    peak_memory: int = 0
     code_length: int
\ No newline at end of file
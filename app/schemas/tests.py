@@ -4,5 +4,7 @@ class TestCase(BaseModel):
     formulas_output: str
     code_output: str
     execution_time: float
+    cpu_time: float = 0.0
+    peak_memory: int = 0
     code_length: int
     execution_status: str
\ No newline at end of file
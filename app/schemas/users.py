@@ -15,3 +15,10 @@ class User(BaseModel):
 
 class UserStatus(BaseModel):
     status: str
+
+
+class RosterImport(BaseModel):
+    study_group: str
+    created: int
+    updated: int
+    enrolled: int
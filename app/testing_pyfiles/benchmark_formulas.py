@@ -0,0 +1,38 @@
+# Замер времени и памяти check_formulas на большом числе вызовов.
+# Запуск: python -m app.testing_pyfiles.benchmark_formulas [количество вызовов]
+import os
+import sys
+import time
+import tracemalloc
+
+from app.testing_pyfiles.formulas import check_formulas
+
+TEST_FILES = os.path.join(os.path.dirname(__file__), 'test_files')
+
+
+def read_test_file(name: str) -> str:
+    with open(os.path.join(TEST_FILES, name), encoding='utf-8') as file:
+        return file.read()
+
+
+def main(calls: int = 100_000, checkpoints: int = 10):
+    teacher_formula = read_test_file('teacher_formula')
+    input_variables = read_test_file('input_variables')
+    student_code = read_test_file('student_code.py')
+
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    for call in range(1, calls + 1):
+        check_formulas(teacher_formula, input_variables, student_code)
+        if call % (calls // checkpoints) == 0:
+            current, peak = tracemalloc.get_traced_memory()
+            print(f"{call:>8} calls: {time.perf_counter() - start_time:8.2f} s, "
+                  f"current {current / 1024:8.1f} KiB, peak {peak / 1024:8.1f} KiB")
+    tracemalloc.stop()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"{calls} calls in {elapsed:.2f} s ({elapsed / calls * 1e6:.1f} us per call)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,163 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+
+from app.config.config import init_config
+from app.testing_pyfiles.sandbox import worker_main
+
+cfg = init_config()['grader']
+
+# fork из многопоточного процесса uvicorn небезопасен, поэтому рабочие процессы
+# порождаются через forkserver (или spawn там, где forkserver недоступен)
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Запуск процесса (импорт модулей приложения) может занимать секунды и не входит в таймаут теста
+START_TIMEOUT = 60
+
+
+class _Worker:
+    def __init__(self, context, cpu_limit: int, memory_limit: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child_conn, cpu_limit, memory_limit), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ExecutionPool:
+    """
+    Ограниченный пул рабочих процессов для выполнения кода студентов.
+    Рабочие процессы переиспользуются между заданиями; при превышении таймаута
+    процесс принудительно завершается и заменяется новым.
+    """
+
+    def __init__(self, workers: int, timeout: float, cpu_limit: int = 0, memory_limit: int = 0):
+        self.size = workers
+        self.timeout = timeout
+        self.cpu_limit = cpu_limit
+        self.memory_limit = memory_limit
+        self._context = multiprocessing.get_context(START_METHOD)
+        self._idle: asyncio.Queue | None = None
+        self._workers: set[_Worker] = set()
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._context, self.cpu_limit, self.memory_limit)
+        self._workers.add(worker)
+        return worker
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        self._workers.discard(worker)
+        worker.kill()
+        return self._spawn()
+
+    def _ensure_started(self):
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for _ in range(self.size):
+                self._idle.put_nowait(self._spawn())
+
+    async def _receive(self, worker: _Worker, timeout: float):
+        # Ожидание результата без блокировки event loop
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        fd = worker.conn.fileno()
+
+        def on_readable():
+            if not readable.done():
+                readable.set_result(None)
+
+        loop.add_reader(fd, on_readable)
+        try:
+            await asyncio.wait_for(readable, timeout)
+        finally:
+            loop.remove_reader(fd)
+        return worker.conn.recv()
+
+    @staticmethod
+    def _failure(output: str, execution_time: float) -> dict:
+        return {"output": output, "status": False, "execution_time": execution_time,
+                "cpu_time": 0.0, "peak_memory": 0, "passed": False}
+
+    @staticmethod
+    def _termination_reason(worker: _Worker) -> str:
+        worker.process.join(timeout=1)
+        if worker.process.exitcode == -getattr(signal, 'SIGXCPU', 0):
+            return "CPU time limit exceeded."
+        return "Execution process terminated unexpectedly."
+
+    async def run(self, code_str: str, cases: list[tuple[str, str]]):
+        """
+        Выполняет код на последовательности тестовых случаев в одном рабочем процессе.
+        Код компилируется один раз; результаты возвращаются по мере выполнения тестов.
+        Таймаут применяется к каждому тесту отдельно.
+
+        :param code_str: Код решения
+        :param cases: Список пар (входные данные, ожидаемый вывод)
+        :return: Асинхронный генератор словарей с ключами output, status, execution_time, cpu_time,
+                 peak_memory, passed
+        """
+        if not cases:
+            return
+
+        self._ensure_started()
+        worker = await self._idle.get()
+        # Рабочий процесс можно вернуть в пул, только если он отправил все результаты задания
+        finished = False
+        try:
+            if not worker.ready:
+                try:
+                    await self._receive(worker, START_TIMEOUT)
+                except (asyncio.TimeoutError, EOFError, OSError):
+                    yield self._failure("Execution process failed to start.", 0.0)
+                    return
+                worker.ready = True
+
+            worker.conn.send((code_str, cases))
+            for _ in cases:
+                try:
+                    execution = await self._receive(worker, self.timeout)
+                except asyncio.TimeoutError:
+                    yield self._failure("Execution timed out.", self.timeout)
+                    return
+                except (EOFError, OSError):
+                    yield self._failure(self._termination_reason(worker), 0.0)
+                    return
+
+                if not execution["passed"]:
+                    finished = True
+                    yield execution
+                    return
+                yield execution
+            finished = True
+        finally:
+            if not finished:
+                worker = self._replace(worker)
+            self._idle.put_nowait(worker)
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.close()
+        self._workers.clear()
+        self._idle = None
+
+
+# workers = 0 - по одному рабочему процессу на ядро
+pool = ExecutionPool(workers=cfg['workers'] or os.cpu_count(), timeout=cfg['timeout'],
+                     cpu_limit=cfg['cpu_limit'], memory_limit=cfg['memory_limit'])
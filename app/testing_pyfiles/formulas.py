@@ -0,0 +1,291 @@
+import ast
+import copy
+import hashlib
+from dataclasses import dataclass
+
+from app.config.config import init_config
+from app.core.cache import LRUCache
+
+cfg = init_config()['grader']
+
+# Операции, для которых порядок операндов не важен
+COMMUTATIVE_OPERATORS = (ast.Add, ast.Mult)
+
+OPERATORS = {
+    ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/', ast.FloorDiv: '//', ast.Mod: '%', ast.Pow: '**',
+    ast.USub: '-', ast.UAdd: '+',
+}
+
+# Функции, вызов которых над input() означает чтение последовательности значений
+SEQUENCE_FUNCTIONS = ('map', 'list', 'tuple')
+
+# Разобранные формулы задач: sha256 текста формул и входных переменных -> (формулы, входные переменные).
+# Ключ зависит только от текста, поэтому изменение формул задачи в любом процессе (скрипты наполнения,
+# правка в БД) не требует сброса кэша: новый текст разбирается заново, а прежняя запись вытесняется по LRU.
+task_formulas = LRUCache(maxsize=cfg['formula_cache_size'])
+
+
+@dataclass(frozen=True)
+class TeacherFormula:
+    target: str | None  # Переменная, которой присваивается результат (None для выражения без присваивания)
+    expression: str | None  # Нормализованное выражение (None, если строку не удалось разобрать)
+
+
+class _Renamer(ast.NodeTransformer):
+    def __init__(self, names: dict[str, str]):
+        self.names = names
+
+    def visit_Name(self, node: ast.Name) -> ast.Name:
+        return ast.Name(id=self.names.get(node.id, node.id), ctx=node.ctx)
+
+
+def _operands(node: ast.BinOp, operator: type) -> list[ast.expr]:
+    # Разворачивает цепочку одинаковых коммутативных операций: a + (b + c) -> [a, b, c]
+    result = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, ast.BinOp) and isinstance(current.op, operator):
+            stack.append(current.right)
+            stack.append(current.left)
+        else:
+            result.append(current)
+    return result
+
+
+def normalize(node: ast.expr, names: dict[str, str]) -> str:
+    """
+    Приводит выражение к каноническому виду: переменные студента заменяются на переменные
+    преподавателя, скобки и пробелы не учитываются, операнды сложения и умножения упорядочиваются.
+
+    :param node: Узел выражения
+    :param names: Соответствие переменных студента переменным преподавателя
+    :return: Строка канонического вида
+    """
+    if isinstance(node, ast.Name):
+        return names.get(node.id, node.id)
+    if isinstance(node, ast.Constant):
+        return repr(node.value)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in OPERATORS:
+        return f"({OPERATORS[type(node.op)]}{normalize(node.operand, names)})"
+    if isinstance(node, ast.BinOp) and type(node.op) in OPERATORS:
+        operator = type(node.op)
+        if isinstance(node.op, COMMUTATIVE_OPERATORS):
+            operands = sorted(normalize(operand, names) for operand in _operands(node, operator))
+            return '(' + OPERATORS[operator].join(operands) + ')'
+        return f"({normalize(node.left, names)}{OPERATORS[operator]}{normalize(node.right, names)})"
+    # Прочие конструкции (вызовы функций, индексы и т.п.) сравниваются по тексту после переименования
+    return ast.unparse(_Renamer(names).visit(copy.deepcopy(node)))
+
+
+def parse_teacher_formulas(teacher_formula_str: str | None) -> tuple[TeacherFormula, ...]:
+    """
+    Разбирает формулы преподавателя (по одной на строку).
+
+    :param teacher_formula_str: Формулы преподавателя
+    :return: Кортеж разобранных формул
+    """
+    formulas = []
+    for line in (teacher_formula_str or '').splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            statement = ast.parse(line).body[0]
+        except (SyntaxError, IndexError):
+            formulas.append(TeacherFormula(target=None, expression=None))
+            continue
+
+        if isinstance(statement, ast.Assign) and len(statement.targets) == 1 \
+                and isinstance(statement.targets[0], ast.Name):
+            formulas.append(TeacherFormula(target=statement.targets[0].id, expression=normalize(statement.value, {})))
+        elif isinstance(statement, ast.Expr):
+            formulas.append(TeacherFormula(target=None, expression=normalize(statement.value, {})))
+        else:
+            formulas.append(TeacherFormula(target=None, expression=None))
+    return tuple(formulas)
+
+
+def parse_input_variables(input_variables_str: str | None) -> tuple[str, ...]:
+    """
+    Разбирает входные переменные преподавателя (через перевод строки или запятую).
+
+    :param input_variables_str: Входные переменные
+    :return: Кортеж имён переменных в порядке ввода
+    """
+    names = (name.strip() for line in (input_variables_str or '').splitlines() for name in line.split(','))
+    return tuple(name for name in names if name)
+
+
+def _is_input_call(node: ast.AST) -> bool:
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'input'
+
+
+def _reads_sequence(node: ast.expr) -> bool:
+    # input().split(), map(int, input().split()), list(...) - чтение нескольких значений
+    for child in ast.walk(node):
+        if isinstance(child, ast.Call):
+            if isinstance(child.func, ast.Attribute) and child.func.attr == 'split':
+                return True
+            if isinstance(child.func, ast.Name) and child.func.id in SEQUENCE_FUNCTIONS:
+                return True
+    return False
+
+
+class _StudentChecker(ast.NodeVisitor):
+    """
+    Обходит присваивания в коде студента в порядке их следования и сопоставляет их с формулами
+    преподавателя. Состояние живёт только в рамках одной проверки.
+    """
+
+    def __init__(self, code_str: str, formulas: tuple[TeacherFormula, ...], input_variables: tuple[str, ...]):
+        self.lines = code_str.splitlines()
+        self.formulas = formulas
+        self.input_variables = input_variables
+        self.input_count = 0
+        self.names: dict[str, str] = {}  # переменная студента -> переменная преподавателя
+        self.sequences: set[str] = set()  # переменные студента со списком входных значений
+        self.matched: dict[int, str] = {}  # номер формулы преподавателя -> формула студента
+
+        # Нормализованное выражение -> номера ещё не найденных формул преподавателя
+        self.pending: dict[str, list[int]] = {}
+        for index, formula in enumerate(formulas):
+            if formula.expression is not None:
+                self.pending.setdefault(formula.expression, []).append(index)
+
+    def _source(self, node: ast.stmt) -> str:
+        # Текст присваивания студента (смещения колонок в ast заданы в байтах UTF-8)
+        lines = [line.encode('utf-8') for line in self.lines[node.lineno - 1:node.end_lineno]]
+        lines[-1] = lines[-1][:node.end_col_offset]
+        lines[0] = lines[0][node.col_offset:]
+        return b'\n'.join(lines).decode('utf-8')
+
+    def _bind_input(self, name: str, index: int | None = None):
+        if index is None:
+            index = self.input_count
+            self.input_count += 1
+        if 0 <= index < len(self.input_variables):
+            self.names[name] = self.input_variables[index]
+
+    def _sequence_index(self, node: ast.expr) -> int | None:
+        # int(inputs[0]) -> 0, если inputs - список входных значений
+        for child in ast.walk(node):
+            if isinstance(child, ast.Subscript) and isinstance(child.value, ast.Name) \
+                    and child.value.id in self.sequences and isinstance(child.slice, ast.Constant) \
+                    and isinstance(child.slice.value, int):
+                return child.slice.value
+        return None
+
+    def visit_Assign(self, node: ast.Assign):
+        if len(node.targets) != 1:
+            return
+        target, value = node.targets[0], node.value
+
+        # Чтение входных данных
+        if any(_is_input_call(child) for child in ast.walk(value)):
+            if isinstance(target, (ast.Tuple, ast.List)):
+                for element in target.elts:
+                    if isinstance(element, ast.Name):
+                        self._bind_input(element.id)
+            elif isinstance(target, ast.Name):
+                if _reads_sequence(value):
+                    self.sequences.add(target.id)
+                else:
+                    self._bind_input(target.id)
+            return
+
+        if isinstance(target, ast.Name):
+            sequence_index = self._sequence_index(value)
+            if sequence_index is not None:
+                self._bind_input(target.id, sequence_index)
+                return
+        elif isinstance(target, (ast.Tuple, ast.List)) and isinstance(value, ast.Name) \
+                and value.id in self.sequences:
+            for index, element in enumerate(target.elts):
+                if isinstance(element, ast.Name):
+                    self._bind_input(element.id, index)
+            return
+        else:
+            return
+
+        # Сопоставление формулы с формулами преподавателя
+        candidates = self.pending.get(normalize(value, self.names))
+        if not candidates:
+            return
+        index = candidates.pop(0)
+        formula = self.formulas[index]
+        self.matched[index] = self._source(node)
+        if formula.target is not None:
+            self.names[target.id] = formula.target
+
+
+def check_student_code(formulas: tuple[TeacherFormula, ...], input_variables: tuple[str, ...],
+                       code_str: str) -> tuple[str, bool]:
+    """
+    Проверяет код студента по уже разобранным формулам преподавателя.
+
+    :param formulas: Формулы преподавателя (parse_teacher_formulas)
+    :param input_variables: Входные переменные преподавателя (parse_input_variables)
+    :param code_str: Код решения
+    :return: Найденные формулы студента (по одной на строку, в порядке формул преподавателя)
+             и признак того, что найдены все формулы
+    """
+    try:
+        tree = ast.parse(code_str)
+    except (SyntaxError, ValueError):
+        return "", not formulas
+
+    checker = _StudentChecker(code_str, formulas, input_variables)
+    checker.visit(tree)
+
+    res = "".join(checker.matched[index] + '\n' for index in range(len(formulas)) if index in checker.matched)
+    return res, len(checker.matched) == len(formulas)
+
+
+def check_formulas(teacher_formula_str: str | None, input_variables_str: str | None,
+                   code_str: str) -> tuple[str, bool]:
+    """
+    Проверяет, что в коде студента реализованы все формулы преподавателя.
+
+    :param teacher_formula_str: Формулы преподавателя
+    :param input_variables_str: Входные переменные преподавателя
+    :param code_str: Код решения
+    :return: Найденные формулы студента и признак того, что найдены все формулы
+    """
+    formulas = parse_teacher_formulas(teacher_formula_str)
+    input_variables = parse_input_variables(input_variables_str)
+    return check_student_code(formulas, input_variables, code_str)
+
+
+def get_task_formulas(teacher_formula_str: str | None,
+                      input_variables_str: str | None) -> tuple[tuple[TeacherFormula, ...], tuple[str, ...]]:
+    """
+    Возвращает разобранные формулы и входные переменные задачи из кэша, разбирая их только
+    при первом обращении к этому тексту формул.
+
+    :param teacher_formula_str: Формулы преподавателя
+    :param input_variables_str: Входные переменные преподавателя
+    :return: Пара (формулы, входные переменные)
+    """
+    source = f"{teacher_formula_str or ''}\0{input_variables_str or ''}"
+    key = hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+    parsed = task_formulas.get(key)
+    if parsed is None:
+        parsed = (parse_teacher_formulas(teacher_formula_str), parse_input_variables(input_variables_str))
+        task_formulas.set(key, parsed)
+    return parsed
+
+
+def check_task_formulas(teacher_formula_str: str | None, input_variables_str: str | None,
+                        code_str: str) -> tuple[str, bool]:
+    """
+    То же, что check_formulas, но формулы преподавателя берутся из кэша.
+
+    :param teacher_formula_str: Формулы преподавателя
+    :param input_variables_str: Входные переменные преподавателя
+    :param code_str: Код решения
+    :return: Найденные формулы студента и признак того, что найдены все формулы
+    """
+    formulas, input_variables = get_task_formulas(teacher_formula_str, input_variables_str)
+    return check_student_code(formulas, input_variables, code_str)
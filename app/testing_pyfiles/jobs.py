@@ -0,0 +1,106 @@
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from app.config.config import init_config
+from app.schemas.tests import TestCase
+from app.testing_pyfiles.test import check_file
+
+cfg = init_config()['grader']
+
+
+class QueueFull(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    user_id: int
+    task_id: int
+    status: str = "queued"  # queued | running | done | error
+    result: TestCase | None = None
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+
+
+class GradingQueue:
+    """
+    Очередь заданий на тестирование решений.
+    Задания выполняются фиксированным набором фоновых обработчиков; при переполнении
+    очереди новые задания отклоняются (QueueFull), а завершённые задания хранятся job_ttl секунд.
+    """
+
+    def __init__(self, workers: int, maxsize: int, ttl: float):
+        self.workers = workers
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._jobs: dict[str, Job] = {}
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _purge(self):
+        # Удаление устаревших завершённых заданий (словарь упорядочен по времени создания)
+        deadline = time.time() - self.ttl
+        for job_id in list(self._jobs):
+            job = self._jobs[job_id]
+            if job.created_at > deadline:
+                break
+            if job.finished_at is not None and job.finished_at <= deadline:
+                del self._jobs[job_id]
+
+    def submit(self, user_id: int, task_id: int, **check_args) -> Job:
+        """
+        Ставит решение в очередь на тестирование.
+
+        :param user_id: ID пользователя, создавшего задание
+        :param task_id: ID задачи
+        :param check_args: Аргументы check_file (кроме task_id)
+        :return: Созданное задание
+        :raises QueueFull: Если очередь заполнена
+        """
+        self._ensure_started()
+        self._purge()
+
+        job = Job(id=uuid.uuid4().hex, user_id=user_id, task_id=task_id)
+        try:
+            self._queue.put_nowait((job, check_args))
+        except asyncio.QueueFull:
+            raise QueueFull()
+
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job, check_args = await self._queue.get()
+            job.status = "running"
+            try:
+                job.result = await check_file(job.task_id, **check_args)
+                job.status = "done"
+            except Exception as e:
+                job.status = "error"
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+
+grading_queue = GradingQueue(workers=cfg['job_workers'], maxsize=cfg['queue_size'], ttl=cfg['job_ttl'])
@@ -0,0 +1,60 @@
+import hashlib
+
+from app.config.config import init_config
+from app.core.cache import LRUCache
+from app.schemas.tests import TestCase
+
+cfg = init_config()['grader']
+
+# Кэш результатов тестирования: (sha256 кода, task_id, отпечаток набора тестов) -> (TestCase, результаты тестов).
+# Отпечаток вычисляется по самим тестовым случаям, с которыми выполняется тестирование, поэтому изменения набора
+# из любого процесса (импорт, скрипты наполнения, правка в БД) меняют ключ; прежние записи больше не читаются.
+results = LRUCache(maxsize=cfg['result_cache_size'], ttl=cfg['result_cache_ttl'])
+
+
+def test_set_version(test_cases: list) -> str:
+    """
+    Отпечаток набора тестовых случаев задачи: sha256 по ID, входным данным и ожидаемому выводу в порядке набора.
+
+    :param test_cases: Тестовые случаи задачи (объекты с атрибутами id, inp, out)
+    :return: Отпечаток набора
+    """
+    digest = hashlib.sha256()
+    for test_case in test_cases:
+        for value in (str(test_case.id), test_case.inp, test_case.out):
+            digest.update(value.encode('utf-8'))
+            digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def result_key(task_id: int, code: str, test_cases: list) -> tuple[str, int, str]:
+    """
+    Формирует ключ кэша по набору тестовых случаев, с которым решение будет протестировано.
+    Ключ нужно получить из того же набора, что передаётся в тестирование, чтобы результат,
+    посчитанный по старому набору тестов, не попал в кэш под новым.
+
+    :param task_id: ID задачи
+    :param code: Код решения
+    :param test_cases: Тестовые случаи задачи
+    :return: Ключ кэша
+    """
+    code_hash = hashlib.sha256(code.encode('utf-8')).hexdigest()
+    return code_hash, task_id, test_set_version(test_cases)
+
+
+def get_result(key: tuple[str, int, str]) -> tuple[TestCase, list[dict]] | None:
+    return results.get(key)
+
+
+def store_result(key: tuple[str, int, str], result: tuple[TestCase, list[dict]]):
+    results.set(key, result)
+
+
+def invalidate_task(task_id: int):
+    """
+    Удаляет закэшированные результаты задачи после изменения её тестовых случаев в этом процессе.
+    Корректность от вызова не зависит (ключ содержит отпечаток набора), сброс лишь освобождает место в кэше.
+
+    :param task_id: ID задачи
+    """
+    results.invalidate(lambda key: key[1] == task_id)
@@ -0,0 +1,200 @@
+import builtins
+import contextlib
+import io
+import sys
+import time
+import types
+
+try:
+    import resource
+except ImportError:  # Windows: ограничения ресурсов и замер памяти недоступны
+    resource = None
+
+# Максимальная длина вывода теста, передаваемого из рабочего процесса (результаты хранятся в кэше результатов;
+# не меньше TEST_OUTPUT_LIMIT из app.db.db - длины вывода, сохраняемого в TestResult)
+OUTPUT_LIMIT = 4096
+
+
+def set_memory_limit(memory_limit: int):
+    # Ограничение адресного пространства рабочего процесса (байты, 0 - без ограничения)
+    if resource and memory_limit:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+
+
+def set_cpu_limit(cpu_limit: int):
+    # RLIMIT_CPU считается за всё время жизни процесса, поэтому перед каждым тестом
+    # мягкий лимит сдвигается на cpu_limit секунд от уже израсходованного времени
+    if resource and cpu_limit:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+        soft = int(usage.ru_utime + usage.ru_stime) + 1 + cpu_limit
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def reset_peak_memory():
+    # Сброс пикового RSS процесса (Linux): рабочий процесс переиспользуется, и без сброса
+    # пик отражал бы максимум всех ранее выполненных в нём заданий
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+
+def peak_memory() -> int:
+    # Пиковый RSS процесса в килобайтах с последнего сброса (VmHWM); без /proc - ru_maxrss за всё время процесса
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if resource:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return 0
+
+
+def outputs_match(output: str, expected_output: str) -> bool:
+    # Сравнение результата с ожидаемым выводом
+    return output.strip() == expected_output.strip()
+
+
+def _restore_attributes(module: types.ModuleType, saved: dict):
+    # Возвращает атрибуты модуля к сохранённым: добавленные удаляются, подменённые восстанавливаются
+    current = vars(module)
+    for name in [name for name in current if name not in saved]:
+        del current[name]
+    for name, value in saved.items():
+        if name not in current or current[name] is not value:
+            current[name] = value
+
+
+@contextlib.contextmanager
+def isolated_job():
+    """
+    Изолирует задание от следующих заданий рабочего процесса: рабочий процесс выполняет решения
+    разных студентов по очереди, и подмена print, input или функции модуля одним решением не должна
+    влиять на другие. Задание получает собственную копию модуля builtins (в том числе через import builtins),
+    а после задания восстанавливаются sys.modules (импортированные решением модули удаляются,
+    подменённые записи возвращаются) и атрибуты ранее загруженных модулей.
+
+    :return: Копия модуля builtins для пространства имён решения
+    """
+    saved_modules = dict(sys.modules)
+    saved_attributes = [(module, dict(vars(module))) for module in saved_modules.values()
+                        if isinstance(module, types.ModuleType)]
+    job_builtins = types.ModuleType('builtins', builtins.__doc__)
+    job_builtins.__dict__.update(builtins.__dict__)
+    sys.modules['builtins'] = job_builtins
+    try:
+        yield job_builtins
+    finally:
+        for name in list(sys.modules):
+            if name not in saved_modules:
+                del sys.modules[name]
+        sys.modules.update(saved_modules)
+        for module, saved in saved_attributes:
+            _restore_attributes(module, saved)
+
+
+def execute(code, input_data: str, cpu_limit: int = 0, job_builtins=builtins) -> dict:
+    """
+    Выполняет скомпилированный код студента на одном тестовом случае.
+    Каждый запуск получает чистое глобальное пространство имён и собственный stdin.
+
+    :param code: Объект кода решения
+    :param input_data: Входные данные теста
+    :param cpu_limit: Лимит процессорного времени на тест в секундах (0 - без ограничения)
+    :param job_builtins: Модуль builtins задания (см. isolated_job)
+    :return: Словарь с выводом программы, статусом, временем выполнения (wall и CPU) и пиковой памятью
+    """
+    if not input_data.endswith('\n'):
+        input_data += '\n'
+
+    # sys доступен без импорта, как и при прежнем запуске через exec()
+    namespace = {"__name__": "__main__", "__builtins__": job_builtins, "sys": sys}
+    output = io.StringIO()
+    execute_status = True
+
+    set_cpu_limit(cpu_limit)
+    reset_peak_memory()
+    saved_stdin, sys.stdin = sys.stdin, io.StringIO(input_data)
+    start_time = time.perf_counter()
+    start_cpu_time = time.process_time()
+    try:
+        with contextlib.redirect_stdout(output):
+            exec(code, namespace)
+    except SystemExit as e:
+        # exit() и sys.exit(0) - обычное завершение программы, вывод сохраняется
+        if e.code not in (None, 0):
+            execute_status = False
+            output.write(f"Error executing code: program exited with code {e.code}")
+    except BaseException as e:
+        execute_status = False
+        output.write(f"Error executing code: {e}")
+    finally:
+        execution_time = time.perf_counter() - start_time
+        cpu_time = time.process_time() - start_cpu_time
+        sys.stdin = saved_stdin
+
+    return {
+        "output": output.getvalue(),
+        "status": execute_status,
+        "execution_time": execution_time,
+        "cpu_time": cpu_time,
+        "peak_memory": peak_memory()
+    }
+
+
+def run_cases(conn, code_str: str, cases: list[tuple[str, str]], cpu_limit: int = 0):
+    """
+    Компилирует код один раз и выполняет его на тестовых случаях по порядку.
+    Результат каждого теста (вывод обрезается до OUTPUT_LIMIT) сразу отправляется в канал;
+    после первого проваленного теста выполнение прекращается.
+
+    :param conn: Канал для отправки результатов
+    :param code_str: Код решения
+    :param cases: Список пар (входные данные, ожидаемый вывод)
+    :param cpu_limit: Лимит процессорного времени на тест в секундах
+    """
+    reset_peak_memory()
+    try:
+        code = compile(code_str, "<solution>", "exec")
+    except (SyntaxError, ValueError) as e:
+        conn.send({"output": f"Error executing code: {e}", "status": False, "execution_time": 0.0,
+                   "cpu_time": 0.0, "peak_memory": peak_memory(), "passed": False})
+        return
+
+    with isolated_job() as job_builtins:
+        for input_data, expected_output in cases:
+            execution = execute(code, input_data, cpu_limit, job_builtins)
+            execution["passed"] = outputs_match(execution["output"], expected_output)
+            # Вывод сравнивается целиком, но отправляется обрезанным
+            execution["output"] = execution["output"][:OUTPUT_LIMIT]
+            conn.send(execution)
+            if not execution["passed"]:
+                return
+
+
+def worker_main(conn, cpu_limit: int = 0, memory_limit: int = 0) -> None:
+    """
+    Главный цикл рабочего процесса: получает задания из канала и отправляет результаты обратно.
+    После запуска процесс отправляет сигнал готовности; задание None означает штатное завершение процесса.
+
+    :param conn: Дочерний конец multiprocessing.Pipe
+    :param cpu_limit: Лимит процессорного времени на тест в секундах (0 - без ограничения)
+    :param memory_limit: Лимит адресного пространства процесса в байтах (0 - без ограничения)
+    """
+    set_memory_limit(memory_limit)
+    conn.send(True)  # процесс запущен и готов принимать задания
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        run_cases(conn, *job, cpu_limit=cpu_limit)
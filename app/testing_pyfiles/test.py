@@ -1,214 +1,244 @@
+import asyncio
 import contextlib
-import io
-import threading
-import time
 
-from  app.db.db import get_test_cases_by_task
-from  app.db.db import update_solution_status
+from  app.config.config import init_config
+from  app.db.async_db import get_test_cases_by_task
+from  app.db.async_db import get_task_grading_data, count_task_solutions, iter_task_solutions, save_grading_results
+from  app.db.db import TEST_OUTPUT_LIMIT
 
 from  app.schemas.tests import TestCase
-
-
-class TeacherList:
-    variables = dict()
-    input_variables = []
-    formulas_teacher = dict()
-    formulas_student = dict()
-    check = []
-    operations_in_math = ['+', '-', '/', '*', '=']
-
-    def __int__(self, variables, formulas):
-        self.variables = variables
-        self.formulas = formulas
-
-    def binding_variables(self, a, b):  # a - student variable, b - teacher variable
-        buff = dict()
-        for i in range(0, len(self.variables)):
-            if b == list(self.variables.items())[i][1]:
-                buff[a] = b
-            else:
-                buff[list(self.variables.items())[i][0]] = list(self.variables.items())[i][1]
-        self.variables = buff
-
-    def binding_formulas(self, a, b):  # a - student formula, b - teacher formula
-        for i in range(0, len(self.formulas_teacher)):
-            if b == list(self.formulas_teacher.items())[i][1]:
-                self.formulas_student[i] = a
-
-    def add_variable(self, a):
-        flag = False
-        for i in range(0, len(self.variables)):
-            if a == self.variables[i]:
-                flag = True
-        if not flag:
-            self.variables[len(self.variables)] = a
-
-    def add_teacher_formula(self, a):
-        buff = []
-        for char1 in a:
-            for char2 in self.operations_in_math:
-                if char1 == char2:
-                    buff.append(a[:a.find(char2)])
-                    self.add_variable(a[:a.find(char2)])
-                    buff.append(char2)
-                    a = a[a.find(char2) + 1:]
-        buff.append(a)
-        self.add_variable(a)
-        self.formulas_teacher[len(self.formulas_teacher)] = buff
-        self.check.append(False)
-
-    def add_student_formula(self, a):
-        formula = []
-        for char1 in a:
-            for char2 in self.operations_in_math:
-                if char1 == char2:
-                    formula.append(a[:a.find(char2)])
-                    formula.append(char2)
-                    a = a[a.find(char2) + 1:]
-        formula.append(a)
-        for ind2 in range(0, len(self.formulas_teacher)):
-            check = True
-            if len(formula) != len(self.formulas_teacher[ind2]):
-                check = False
-            for ind1 in range(2, len(formula), 2):
-                if ind1 % 2 == 0:
-                    try:
-                        if self.variables[formula[ind1]] != self.formulas_teacher[ind2][ind1]:
-                            check = False
-                    except KeyError:
-                        check = False
-                    except IndexError:
-                        check = False
-                else:
-                    try:
-                        if formula[ind1] != self.formulas[ind2][ind1]:
-                            check = False
-                    except IndexError:
-                        check = False
-            if check:
-                self.binding_variables(formula[0], self.formulas_teacher[ind2][0])
-                self.binding_formulas(formula, self.formulas_teacher[ind2])
-
-
-async def check_formulas(teacher_formula_str, input_variables_str, code_str) -> tuple[str, bool]:
-    teacher_list = TeacherList()
-    for line in teacher_formula_str.splitlines():
-        line = line.rstrip()
-        teacher_list.add_teacher_formula(line)
-
-    for line in input_variables_str.splitlines():
-        line = line.rstrip()
-        teacher_list.input_variables.append(line)
-
-    input_count = 0
-    for line in code_str.splitlines():
-        line = line.rstrip()
-        if 'input()' in line:
-            char = line[:line.find('=')].strip()
-            teacher_list.binding_variables(char, teacher_list.input_variables[input_count])
-            input_count += 1
-        else:
-            teacher_list.add_student_formula(line)
-
-    res = ""
-    all_formulas_correct = True
-    for i in range(len(teacher_list.formulas_teacher)):
-        if i in teacher_list.formulas_student:
-            student_formula = "".join(teacher_list.formulas_student[i])
-            teacher_formula = "".join(teacher_list.formulas_teacher[i])
-            if student_formula != teacher_formula:
-                all_formulas_correct = False
-            res += student_formula + '\n'
-        else:
-            all_formulas_correct = False
-
-    return res, all_formulas_correct
-
-
-async def run_tests(task_id: int, code_str: str) -> dict:
-    test_cases = get_test_cases_by_task(task_id)
+from  app.testing_pyfiles.executor import pool
+from  app.testing_pyfiles.formulas import check_task_formulas
+from  app.testing_pyfiles.result_cache import result_key, get_result, store_result
+
+cfg = init_config()['grader']
+
+
+async def run_cases_sequential(code_str: str, test_cases: list) -> list[dict]:
+    # Тесты выполняются по очереди в одном рабочем процессе до первого проваленного
+    cases = [(test_case.inp, test_case.out) for test_case in test_cases]
+    async with contextlib.aclosing(pool.run(code_str, cases)) as executions:
+        return [execution async for execution in executions]
+
+
+async def run_cases_parallel(code_str: str, test_cases: list) -> list[dict]:
+    # Тесты делятся на непрерывные блоки по числу рабочих процессов пула. При провале теста
+    # отменяются блоки с большими номерами тестов, поэтому результат совпадает с последовательным запуском
+    if not test_cases:
+        return []
+
+    chunk_count = min(pool.size, len(test_cases))
+    chunk_size = -(-len(test_cases) // chunk_count)
+    starts = list(range(0, len(test_cases), chunk_size))
+    executions = [None] * len(test_cases)
+    failed_index = len(test_cases) - 1
+
+    async def run_chunk(start: int):
+        nonlocal failed_index
+        cases = [(test_case.inp, test_case.out) for test_case in test_cases[start:start + chunk_size]]
+        async with contextlib.aclosing(pool.run(code_str, cases)) as chunk_executions:
+            index = start
+            async for execution in chunk_executions:
+                executions[index] = execution
+                if not execution["passed"] and index < failed_index:
+                    failed_index = index
+                    for task in tasks:
+                        if task_start[task] > index:
+                            task.cancel()
+                index += 1
+
+    tasks = [asyncio.create_task(run_chunk(start)) for start in starts]
+    task_start = dict(zip(tasks, starts))
+    try:
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    # Отмена блоков после проваленного теста ожидаема (CancelledError), остальные ошибки передаются дальше:
+    # у блока с ошибкой нет результатов тестов
+    for outcome in outcomes:
+        if isinstance(outcome, Exception):
+            raise outcome
+
+    return executions[:failed_index + 1]
+
+
+async def run_tests(task_id: int, code_str: str, test_cases: list) -> dict:
     total_execution_time = 0
     code_length = sum(1 for line in code_str.split('\n') if line.strip())
 
-    for index, test_case in enumerate(test_cases):
-        input_data = test_case.inp
-        expected_output = test_case.out
-
-        # Подготовка кода с входными данными
-        code_with_input = f"import sys\ninput = lambda: '{input_data}'\n{code_str}"
-
-        # Выполнение кода
-        output = io.StringIO()
-        start_time = time.time()
-        execute_status = True
-
-        def exec_code():
-            try:
-                with contextlib.redirect_stdout(output):
-                    exec(code_with_input)
-            except Exception as e:
-                nonlocal execute_status
-                execute_status = False
-                output.write(f"Error executing code: {e}")
-
-        thread = threading.Thread(target=exec_code)
-        thread.start()
-        thread.join(timeout=5)
-
-        if thread.is_alive():
-            output.write("Execution timed out.")
-            thread.join()
-
-        end_time = time.time()
-        execution_time = round(end_time - start_time, 3)
+    # Выполнение кода в пуле рабочих процессов
+    if cfg['parallel_cases']:
+        executions = await run_cases_parallel(code_str, test_cases)
+    else:
+        executions = await run_cases_sequential(code_str, test_cases)
+
+    # Результаты выполненных тестов для сохранения в TestResult
+    case_results = [
+        {
+            "test_case_id": test_case.id,
+            "passed": execution["passed"],
+            "execution_time": round(execution["execution_time"], 3),
+            "cpu_time": round(execution["cpu_time"], 3),
+            "peak_memory": execution["peak_memory"],
+            "output": execution["output"]
+        }
+        for test_case, execution in zip(test_cases, executions)
+    ]
+    total_cpu_time = round(sum(execution["cpu_time"] for execution in executions), 3)
+    peak_memory = max((execution["peak_memory"] for execution in executions), default=0)
+
+    for index, (test_case, execution) in enumerate(zip(test_cases, executions)):
+        execution_time = round(execution["execution_time"], 3)
         total_execution_time += execution_time
-        result = output.getvalue()
+        result = execution["output"]
 
-        # Сравнение результата с ожидаемым выводом
-        if result.strip() != expected_output.strip():
+        if not execution["passed"]:
             return {
                 "test_case_number": index + 1,
-                "input_data": input_data,
-                "user_output": result.strip(),
-                "expected_output": expected_output.strip(),
+                "input_data": test_case.inp,
+                "user_output": result.strip()[:TEST_OUTPUT_LIMIT],  # Вывод в сообщении о проваленном тесте
+                "expected_output": test_case.out.strip(),
+                "total_execution_time": round(total_execution_time, 3),
+                "total_cpu_time": total_cpu_time,
+                "peak_memory": peak_memory,
+                "case_results": case_results,
                 "status": "Failed"
             }
 
     return {
         "total_execution_time": round(total_execution_time, 3),
+        "total_cpu_time": total_cpu_time,
+        "peak_memory": peak_memory,
         "code_length": code_length,
         "execution_status": "Success",
+        "case_results": case_results,
         "status": "Success"
     }
 
 
-# main testing function
-async def check_file(task_id: int, teacher_formula: str, input_variables: str, student_code: str,
-                     solution_id: int) -> TestCase:
+async def grade_solution(task_id: int, teacher_formula: str, input_variables: str, student_code: str,
+                         test_cases: list | None = None, use_cached: bool = True,
+                         cache_key: tuple[str, int, str] | None = None) -> tuple[TestCase, list[dict]]:
+    """
+    Тестирует код решения без записи результатов в БД.
+
+    :param task_id: ID задачи
+    :param teacher_formula: Формулы преподавателя
+    :param input_variables: Входные переменные преподавателя
+    :param student_code: Код решения
+    :param test_cases: Тестовые случаи задачи (если не переданы, загружаются из БД)
+    :param use_cached: Брать результат из кэша, если он есть (False - всегда выполнять тесты заново;
+                       свежий результат всё равно сохраняется в кэш)
+    :param cache_key: Ключ кэша результатов (result_key), полученный вместе с test_cases;
+                      если не передан, вычисляется здесь
+    :return: Итог тестирования и результаты по каждому выполненному тесту
+    """
+    if test_cases is None:
+        test_cases = await get_test_cases_by_task(task_id)
+
+    # Повторная отправка того же кода на тот же набор тестов не выполняется заново
+    if cache_key is None:
+        cache_key = result_key(task_id, student_code, test_cases)
+    cached = get_result(cache_key) if use_cached else None
+    if cached:
+        return cached
+
     # Проверка формул
-    formulas_output, formulas_correct = await check_formulas(teacher_formula, input_variables, student_code)
+    formulas_output, formulas_correct = check_task_formulas(teacher_formula, input_variables, student_code)
 
     # Выполнение тестов
-    test_result = await run_tests(task_id, student_code)
+    test_result = await run_tests(task_id, student_code, test_cases)
 
     if test_result.get("status") == "Failed":
-        update_solution_status(solution_id, "Failed")
-        return TestCase(
+        result = TestCase(
             formulas_output=formulas_output,
             code_output=f"Test case {test_result['test_case_number']} failed.\n"
                         f"Input: {test_result['input_data']}\n"
                         f"Expected output: {test_result['expected_output']}\n"
                         f"User output: {test_result['user_output']}",
-            execution_time=0.0,
+            execution_time=test_result['total_execution_time'],
+            cpu_time=test_result['total_cpu_time'],
+            peak_memory=test_result['peak_memory'],
             code_length=0,
             execution_status=test_result["status"]
         )
+    else:
+        result = TestCase(
+            formulas_output=formulas_output,
+            code_output="All tests passed successfully.",
+            execution_time=test_result['total_execution_time'],
+            cpu_time=test_result['total_cpu_time'],
+            peak_memory=test_result['peak_memory'],
+            code_length=test_result['code_length'],
+            execution_status=test_result["status"]
+        )
 
-    update_solution_status(solution_id, "Success")
-    return TestCase(
-        formulas_output=formulas_output,
-        code_output="All tests passed successfully.",
-        execution_time=test_result['total_execution_time'],
-        code_length=test_result['code_length'],
-        execution_status=test_result["status"]
-    )
+    store_result(cache_key, (result, test_result["case_results"]))
+    return result, test_result["case_results"]
+
+
+def solution_update(solution_id: int, result: TestCase, case_results: list[dict]) -> dict:
+    # Данные для записи итогов тестирования в Solution
+    return {
+        "id": solution_id,
+        "status": result.execution_status,
+        "execution_time": round(sum(case["execution_time"] for case in case_results), 3),
+        "cpu_time": result.cpu_time,
+        "peak_memory": result.peak_memory
+    }
+
+
+# main testing function
+async def check_file(task_id: int, teacher_formula: str, input_variables: str, student_code: str,
+                     solution_id: int, test_cases: list | None = None,
+                     cache_key: tuple[str, int, str] | None = None) -> TestCase:
+    result, case_results = await grade_solution(task_id, teacher_formula, input_variables, student_code, test_cases,
+                                                cache_key=cache_key)
+
+    # Статус решения и результаты по каждому тесту сохраняются одной транзакцией
+    await save_grading_results([(solution_update(solution_id, result, case_results), case_results)])
+    return result
+
+
+async def regrade_task(task_id: int, chunk_size: int):
+    """
+    Перепроверяет все решения задачи. Решения читаются из БД порциями по chunk_size,
+    каждая порция тестируется в пуле рабочих процессов (не больше pool.size решений одновременно)
+    и записывается одной транзакцией.
+    Формулы и тестовые случаи читаются из БД, а кэш результатов не используется: перепроверка после
+    исправления тестов или формул не должна записывать в БД прежние вердикты.
+
+    :param task_id: ID задачи
+    :param chunk_size: Размер порции решений
+    :return: Асинхронный генератор словарей с прогрессом перепроверки
+    """
+    task_data = await get_task_grading_data(task_id)
+    if not task_data:
+        raise ValueError(f"Task with ID {task_id} not found.")
+
+    progress = {"task_id": task_id, "total": await count_task_solutions(task_id), "processed": 0,
+                "success": 0, "failed": 0}
+
+    # Одновременно тестируется не больше pool.size решений: очередь свободных рабочих процессов общая
+    # с заданиями /test, и порция решений, отправленная целиком, задерживала бы их до конца порции
+    slots = asyncio.Semaphore(pool.size)
+
+    async def grade(code: str) -> tuple[TestCase, list[dict]]:
+        async with slots:
+            return await grade_solution(task_id, task_data['teacher_formula'], task_data['input_variables'], code,
+                                        task_data['test_cases'], use_cached=False)
+
+    async for chunk in iter_task_solutions(task_id, chunk_size):
+        graded = await asyncio.gather(*(grade(code) for _, code in chunk))
+
+        await save_grading_results([
+            (solution_update(solution_id, result, case_results), case_results)
+            for (solution_id, _), (result, case_results) in zip(chunk, graded)
+        ])
+
+        progress["processed"] += len(chunk)
+        for result, _ in graded:
+            progress["success" if result.execution_status == "Success" else "failed"] += 1
+        yield dict(progress)
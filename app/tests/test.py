@@ -1,15 +1,6 @@
 from app.db.db import *
 
 
-# Определение функций
-def delete_tables():
-    Base.metadata.drop_all(engine)
-
-
-def create_tables():
-    Base.metadata.create_all(engine)
-
-
 delete_tables()
 create_tables()
 
@@ -0,0 +1,153 @@
+# Число SQL-запросов функций доступа к БД, разрешающих связи пользователей и дисциплин.
+# Тесты выполняются на БД из app/config/config.json (схема - python -m app.migrate):
+#    python -m pytest app/tests
+import asyncio
+import contextlib
+import uuid
+
+import pytest
+from sqlalchemy import event, delete, select
+from sqlalchemy.exc import OperationalError
+
+from app.db import async_db, db
+
+SUBJECTS = 3  # Число дисциплин пользователя: запросов должно быть столько же, сколько при одной
+
+
+@contextlib.contextmanager
+def count_queries():
+    # Собирает SQL-запросы обоих движков (синхронного и асинхронного) внутри блока with
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = (db.engine, async_db.engine.sync_engine)
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def run_async(coro):
+    # Соединения asyncpg привязаны к event loop, поэтому пул освобождается до закрытия loop
+    async def run():
+        try:
+            return await coro
+        finally:
+            await async_db.engine.dispose()
+
+    return asyncio.run(run())
+
+
+@pytest.fixture(scope='module')
+def enrolled_user():
+    """
+    Пользователь, зачисленный на SUBJECTS дисциплин с оценками, задача первой дисциплины
+    и дисциплина, на которую пользователь не зачислен. После тестов данные удаляются.
+    """
+    try:
+        with db.engine.connect():
+            pass
+    except OperationalError:
+        pytest.skip("Database from app/config/config.json is not available")
+
+    prefix = f"qc-{uuid.uuid4().hex[:8]}"
+    username = f"{prefix}-student"
+    subject_names = [f"{prefix}-subject-{index}" for index in range(SUBJECTS + 1)]
+
+    db.add_user_test(username=username, password='student')
+    for name in subject_names:
+        db.add_subject(name=name)
+
+    with db.Session() as session:
+        user_id = session.scalar(select(db.User.id).filter_by(username=username))
+        subject_ids = list(session.scalars(
+            select(db.Subject.id).where(db.Subject.name.in_(subject_names)).order_by(db.Subject.id)
+        ))
+
+    enrolled_ids, other_id = subject_ids[:SUBJECTS], subject_ids[SUBJECTS]
+    for grade, subject_id in enumerate(enrolled_ids, start=5):
+        db.reg_user_in_subject(user_id, subject_id)
+        db.add_user_subject_grade(user_id, subject_id, grade)
+    db.add_task(name=f"{prefix}-task", subject_identifier=enrolled_ids[0])
+    db.add_task(name=f"{prefix}-other-task", subject_identifier=other_id)
+
+    with db.Session() as session:
+        task_id, other_task_id = session.scalars(
+            select(db.Task.id).where(db.Task.Subject_id.in_([enrolled_ids[0], other_id])).order_by(db.Task.Subject_id)
+        ).all()
+
+    yield {
+        "user_id": user_id,
+        "username": username,
+        "subject_ids": enrolled_ids,
+        "other_subject_id": other_id,
+        "task_id": task_id,
+        "other_task_id": other_task_id,
+    }
+
+    with db.Session() as session:
+        session.execute(delete(db.Solution).where(db.Solution.User_id == user_id))
+        session.execute(delete(db.Task).where(db.Task.Subject_id.in_(subject_ids)))
+        session.execute(delete(db.UserSubjectGrade).where(db.UserSubjectGrade.user_id == user_id))
+        session.execute(delete(db.association_table).where(db.association_table.c.user_id == user_id))
+        session.execute(delete(db.Subject).where(db.Subject.id.in_(subject_ids)))
+        session.execute(delete(db.User).where(db.User.id == user_id))
+        session.commit()
+    db.catalogue.invalidate()
+
+
+def test_get_user_subjects_single_query(enrolled_user):
+    with count_queries() as statements:
+        subjects = db.get_user_subjects(enrolled_user['username'])
+
+    assert len(statements) == 1
+    assert [(subject.id, subject.grade) for subject in sorted(subjects, key=lambda subject: subject.id)] == \
+        [(subject_id, grade) for grade, subject_id in enumerate(enrolled_user['subject_ids'], start=5)]
+
+
+def test_async_get_user_subjects_single_query(enrolled_user):
+    with count_queries() as statements:
+        subjects = run_async(async_db.get_user_subjects(enrolled_user['user_id']))
+
+    assert len(statements) == 1
+    assert sorted(subject.id for subject in subjects) == enrolled_user['subject_ids']
+
+
+def test_is_user_enrolled_in_subject_single_query(enrolled_user):
+    for subject_id, expected in ((enrolled_user['subject_ids'][-1], True), (enrolled_user['other_subject_id'], False)):
+        with count_queries() as statements:
+            enrolled = db.is_user_enrolled_in_subject(enrolled_user['username'], str(subject_id))
+
+        assert len(statements) == 1
+        assert enrolled is expected
+
+
+def test_add_solution_checks_enrollment_in_one_query(enrolled_user):
+    # Проверка задачи, пользователя и зачисления - один запрос; затем сохранение кода и вставка решения
+    with count_queries() as statements:
+        added = db.add_solution(code='print(1)', user_id=enrolled_user['user_id'], task_id=enrolled_user['task_id'])
+
+    assert added is True
+    assert len(statements) == 3
+
+    with count_queries() as statements:
+        added = db.add_solution(code='print(1)', user_id=enrolled_user['user_id'],
+                                task_id=enrolled_user['other_task_id'])
+
+    assert added == "User is not enrolled in the subject."
+    assert len(statements) == 1
+
+
+def test_get_users_by_subject_single_query(enrolled_user):
+    with count_queries() as statements:
+        users = db.get_users_by_subject(enrolled_user['subject_ids'][0])
+        # Пользователи загружены тем же запросом и доступны после закрытия сессии
+        usernames = [user.username for user in users]
+
+    assert len(statements) == 1
+    assert enrolled_user['username'] in usernames